@@ -0,0 +1,47 @@
+import gc
+import os
+
+from src.config import WEB_CONCURRENCY, WORKER_THREADS
+
+# Run with: gunicorn -c gunicorn.conf.py wsgi:app
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = WEB_CONCURRENCY
+# Threaded workers so the admission controller can queue and prioritise
+# concurrent requests within each process; its pool sizes derive from this
+threads = WORKER_THREADS
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+
+# Import the app (and load the model) in the master so workers share the
+# weights copy-on-write instead of each loading their own copy.
+preload_app = True
+
+
+def when_ready(server):
+    # Move everything allocated during warm-up out of the GC's tracked
+    # generations so collections in the workers don't touch (and copy) those pages.
+    gc.collect()
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from main import app, start_reconciler
+    from src.models.user import db
+    from src.utils.services import get_embedding_service, reopen_after_fork, warm_up
+
+    # SQLite connections opened in the master must not be shared with children
+    with app.app_context():
+        db.engine.dispose()
+    reopen_after_fork()
+
+    # Split the cores between workers rather than letting every worker's
+    # intra-op pool claim all of them, unless EMBEDDING_THREADS pins it
+    embedding_service = get_embedding_service()
+    if not os.environ.get('EMBEDDING_THREADS'):
+        embedding_service.set_num_threads(max(1, (os.cpu_count() or 1) // server.cfg.workers))
+    # Backends skipped before the fork (ONNX Runtime) are built here, per worker
+    if not embedding_service.fork_safe:
+        warm_up()
+
+    # Threads don't survive fork, so background work starts in each worker
+    start_reconciler()
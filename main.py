@@ -3,32 +3,52 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
+from src.config import DATABASE_URI, UPLOAD_FOLDER, reconciler_lock_path
 from src.models.user import db
-from src.models.document import Document, DocumentChunk, Conversation
+from src.models.document import Document, DocumentChunk, Conversation, create_missing_indexes
 from src.routes.user import user_bp
 from src.routes.document import document_bp
 from src.routes.qa import qa_bp
+from src.routes.health import health_bp
+from src.utils.admission import AdmissionRejected
+from src.utils.reconciler import start_background_reconciler
+from src.utils.services import get_vector_store, warm_up
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 # Enable CORS for all routes
-CORS(app, origins="*")
+CORS(app, origins=os.environ.get('CORS_ORIGINS', '*').split(','))
 
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(document_bp, url_prefix='/api')
 app.register_blueprint(qa_bp, url_prefix='/api')
+app.register_blueprint(health_bp, url_prefix='/api')
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    response = jsonify({'error': str(error), 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 with app.app_context():
     db.create_all()
+    create_missing_indexes()
+
+def start_reconciler():
+    """Start the orphan reconciler when RECONCILE_INTERVAL (seconds) is set"""
+    interval = float(os.environ.get('RECONCILE_INTERVAL', '0'))
+    if interval > 0:
+        start_background_reconciler(app, get_vector_store(), UPLOAD_FOLDER, interval, reconciler_lock_path())
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -48,4 +68,6 @@ def serve(path):
 
 
 if __name__ == '__main__':
+    warm_up()
+    start_reconciler()
     app.run(host='0.0.0.0', port=5000, debug=True)
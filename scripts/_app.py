@@ -0,0 +1,20 @@
+from flask import Flask
+
+from src.config import ARCHIVE_FOLDER, DATABASE_URI, UPLOAD_FOLDER  # noqa: F401  (re-exported for scripts)
+from src.models.user import db
+from src.models.document import Document, DocumentChunk, Conversation, create_missing_indexes  # noqa: F401  (register tables)
+
+
+def create_cli_app() -> Flask:
+    """
+    Bare Flask app bound to the same database as main.py, for command line
+    tools that need the models without loading the API's services
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        create_missing_indexes()
+    return app
@@ -0,0 +1,35 @@
+"""
+Move old conversations from the database into compressed monthly archives.
+
+Usage (from the project root):
+    python -m scripts.archive_conversations               # uses CONVERSATION_RETENTION_DAYS (default 90)
+    python -m scripts.archive_conversations --days 30
+
+Archived conversations remain readable through
+GET /api/qa/conversations?include_archived=1.
+"""
+import argparse
+import json
+import os
+import sys
+
+from scripts._app import ARCHIVE_FOLDER, create_cli_app
+from src.utils.archive import ConversationArchive
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=float, default=float(os.environ.get('CONVERSATION_RETENTION_DAYS', '90')),
+                        help='archive conversations older than this many days')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    app = create_cli_app()
+    with app.app_context():
+        report = ConversationArchive(ARCHIVE_FOLDER).archive_older_than(args.days, batch_size=args.batch_size)
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Compare the streaming DOCX extractor with the python-docx object-tree path.
+
+Usage (from the project root):
+    python -m scripts.benchmark_docx report1.docx report2.docx
+    python -m scripts.benchmark_docx --paragraphs 20000 --tables 500
+
+Without file arguments a synthetic report is generated with python-docx.
+Each path runs in its own subprocess, so the reported peak RSS includes
+lxml's C allocations. Reports wall time, peak RSS, growth of peak RSS
+over the process baseline after imports, and chunk counts for each path.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# python-docx and DocumentProcessor are imported only in the child processes:
+# Linux carries ru_maxrss across fork and exec, so the parent must stay small
+# for the children's peaks to mean anything.
+
+
+def build_synthetic_docx(path: str, paragraphs: int, tables: int, rows: int = 20):
+    """Write a report with interleaved headings, paragraphs and tables"""
+    from docx import Document as DocxDocument
+
+    doc = DocxDocument()
+    tables_every = max(1, paragraphs // max(1, tables))
+    table_count = 0
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            doc.add_heading(f"Section {i // 50 + 1}", level=1)
+        doc.add_paragraph(
+            f"Paragraph {i} describes clause {i % 97} of the agreement. "
+            f"The supplier shall deliver the goods within {i % 30 + 1} days of the order date."
+        )
+        if table_count < tables and i % tables_every == 0:
+            table = doc.add_table(rows=rows, cols=3)
+            for r, row in enumerate(table.rows):
+                row.cells[0].text = f"Item {r}"
+                row.cells[1].text = f"{r * 10} units"
+                row.cells[2].text = f"Penalty of {r * 5} per day for late delivery"
+            table_count += 1
+    doc.save(path)
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ('tree', 'streaming')
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024  # KiB on Linux
+
+
+def run_child(label: str, file_path: str) -> dict:
+    """Extract one file with one path; runs inside the measuring subprocess"""
+    from src.utils.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    func = processor._process_docx_tree if label == 'tree' else processor._process_docx
+    baseline = peak_rss()
+    start = time.perf_counter()
+    result = func(file_path)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss()
+    return {'seconds': elapsed, 'peak': peak, 'growth': peak - baseline, 'chunks': len(result['chunks'])}
+
+
+def run_script(*args) -> str:
+    return subprocess.run(
+        [sys.executable, '-m', 'scripts.benchmark_docx', *args],
+        cwd=PROJECT_ROOT, check=True, capture_output=True, text=True
+    ).stdout
+
+
+def measure(label: str, file_path: str) -> dict:
+    """Run one path in a fresh interpreter so earlier runs don't raise its peak RSS"""
+    return json.loads(run_script('--child', label, file_path).strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--paragraphs', type=int, default=5000)
+    parser.add_argument('--tables', type=int, default=100)
+    parser.add_argument('--child', choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument('--build', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.files[0])))
+        return 0
+    if args.build:
+        build_synthetic_docx(args.files[0], args.paragraphs, args.tables)
+        return 0
+
+    paths = args.files
+    tmp_dir = None
+    if not paths:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmp_dir.name, 'synthetic.docx')
+        run_script('--build', '--paragraphs', str(args.paragraphs), '--tables', str(args.tables), path)
+        paths = [path]
+
+    mb = 1024 * 1024
+    print(f"{'file':<30} {'path':<10} {'seconds':>9} {'peak RSS MB':>12} {'growth MB':>10} {'chunks':>8}")
+    for path in paths:
+        for label in PATHS:
+            stats = measure(label, os.path.abspath(path))
+            print(f"{os.path.basename(path)[:30]:<30} {label:<10} {stats['seconds']:>9.3f} "
+                  f"{stats['peak'] / mb:>12.1f} {stats['growth'] / mb:>10.1f} {stats['chunks']:>8}")
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Benchmark and accuracy check for the embedding backends.
+
+Usage (from the project root):
+    python -m scripts.benchmark_embeddings --backends torch int8 onnx --chunks 2000
+    python -m scripts.benchmark_embeddings report.pdf contracts/*.docx notes.md
+
+Chunks are cut from the given files (PDF, DOCX, XLSX, Markdown or plain
+text) with the same extractor and chunker used for uploads. Without files
+a seeded synthetic corpus of varied length and vocabulary is generated and
+mixed with sample_document.md. Every backend is compared against the eager
+``torch`` reference on distinct chunks: the cosine between each pair of
+embeddings of the same chunk, and the largest difference between the two
+chunk-to-chunk similarity matrices.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from src.utils.document_processor import DocumentProcessor, EmbeddingService, EMBEDDING_BACKENDS
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'sample_document.md')
+
+
+# Vocabulary for the synthetic corpus, spread over the kinds of documents users upload
+SYNTHETIC_TOPICS = {
+    'contract': (
+        ['The supplier', 'The buyer', 'Either party', 'The licensee', 'The contractor'],
+        ['shall deliver', 'may terminate', 'must indemnify', 'agrees to reimburse', 'will notify'],
+        ['the goods', 'the agreement', 'all third-party claims', 'reasonable travel costs', 'the other party'],
+        ['within {n} days of the order date', 'after a written notice period of {n} weeks',
+         'up to a cap of {n} thousand euros', 'unless the breach is cured within {n} days'],
+    ),
+    'finance': (
+        ['Revenue', 'Operating margin', 'Free cash flow', 'Net debt', 'The dividend'],
+        ['rose', 'fell', 'was flat', 'recovered', 'outperformed guidance'],
+        ['in the third quarter', 'year over year', 'in the European segment', 'after currency effects'],
+        ['by {n} percent', 'to {n} million dollars', 'for the {n}th consecutive quarter'],
+    ),
+    'medical': (
+        ['The patient', 'The trial cohort', 'The attending physician', 'The control group'],
+        ['reported', 'was prescribed', 'showed', 'discontinued'],
+        ['mild nausea', 'a daily dose of metformin', 'reduced blood pressure', 'the study medication'],
+        ['after {n} days of treatment', 'in {n} of the enrolled subjects', 'at the {n}-week follow-up'],
+    ),
+    'engineering': (
+        ['The pump', 'The control unit', 'The load balancer', 'Each replica', 'The bearing assembly'],
+        ['exceeded', 'must be inspected for', 'was rated for', 'failed under'],
+        ['its thermal limit', 'corrosion', 'a sustained load', 'the vibration threshold'],
+        ['every {n} operating hours', 'at {n} degrees Celsius', 'with {n} concurrent connections'],
+    ),
+}
+
+
+def _synthetic_paragraph(rng: random.Random) -> str:
+    subjects, verbs, objects, qualifiers = SYNTHETIC_TOPICS[rng.choice(sorted(SYNTHETIC_TOPICS))]
+    sentences = []
+    for _ in range(rng.choice((1, 2, 3, 5, 8, 12))):
+        qualifier = rng.choice(qualifiers).format(n=rng.randint(2, 365))
+        sentences.append(f"{rng.choice(subjects)} {rng.choice(verbs)} {rng.choice(objects)} {qualifier}.")
+    return " ".join(sentences)
+
+
+def synthetic_chunks(n_chunks: int, seed: int = 0):
+    """Distinct chunks from seeded random paragraphs of one to twelve sentences"""
+    rng = random.Random(seed)
+    processor = DocumentProcessor()
+    texts = []
+    seen = set()
+    while len(texts) < n_chunks:
+        for chunk in processor._create_chunks(_synthetic_paragraph(rng)):
+            if chunk['text'] not in seen:
+                seen.add(chunk['text'])
+                texts.append(chunk['text'])
+    return texts[:n_chunks]
+
+
+def file_chunks(paths):
+    """Extract and chunk input files the way uploads are processed"""
+    processor = DocumentProcessor()
+    texts = []
+    for path in paths:
+        if processor.is_supported_format(path):
+            result = processor.process_document(path, os.path.basename(path))
+            if not result.get('success'):
+                raise SystemExit(f"Could not extract {path}: {result.get('error')}")
+            texts.extend(chunk['text'] for chunk in result['chunks'])
+        else:
+            with open(path, encoding='utf-8') as f:
+                for paragraph in f.read().split('\n\n'):
+                    texts.extend(chunk['text'] for chunk in processor._create_chunks(paragraph))
+    return texts
+
+
+def load_corpus(paths, n_chunks: int):
+    """
+    Return (throughput texts, distinct texts). Input files that yield fewer
+    than n_chunks chunks are cycled for the throughput run only.
+    """
+    texts = file_chunks(paths) if paths else file_chunks([SAMPLE_PATH]) + synthetic_chunks(n_chunks)
+    distinct = list(dict.fromkeys(texts))
+    if not distinct:
+        raise SystemExit("No chunks could be extracted from the input")
+    return (distinct * (n_chunks // len(distinct) + 1))[:n_chunks], distinct
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def compare_embeddings(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Compare candidate embeddings against the reference ones for the same texts"""
+    ref = _normalise(reference)
+    cand = _normalise(candidate)
+    self_cosine = np.sum(ref * cand, axis=1)
+    similarity_gap = np.abs(ref @ ref.T - cand @ cand.T)
+    return {
+        'mean_cosine': float(self_cosine.mean()),
+        'min_cosine': float(self_cosine.min()),
+        'max_similarity_gap': float(similarity_gap.max()),
+    }
+
+
+def benchmark(service: EmbeddingService, texts, repeats: int) -> float:
+    """Return the best chunks/s over several encode runs"""
+    service.generate_embeddings(texts[:service.batch_size])  # warm-up
+    best = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        service.generate_embeddings(texts)
+        best = max(best, len(texts) / (time.perf_counter() - start))
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='documents to take chunks from (default: synthetic corpus)')
+    parser.add_argument('--backends', nargs='+', choices=EMBEDDING_BACKENDS,
+                        default=[b for b in EMBEDDING_BACKENDS if b != 'stub'])
+    parser.add_argument('--chunks', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--accuracy-sample', type=int, default=256,
+                        help='number of distinct chunks used for the accuracy comparison')
+    parser.add_argument('--min-cosine', type=float, default=0.98,
+                        help='fail if any chunk embedding drifts below this cosine to the reference')
+    args = parser.parse_args(argv)
+
+    texts, distinct = load_corpus(args.files, args.chunks)
+    accuracy_texts = distinct[:args.accuracy_sample]
+    if len(accuracy_texts) < args.accuracy_sample:
+        print(f"Only {len(accuracy_texts)} distinct chunks available for the accuracy check")
+    lengths = [len(t) for t in texts]
+    print(f"{len(texts)} chunks ({len(distinct)} distinct), {min(lengths)}-{max(lengths)} characters")
+
+    reference = EmbeddingService(backend='torch', num_threads=args.threads, batch_size=args.batch_size)
+    reference_embeddings = np.asarray(reference.generate_embeddings(accuracy_texts))
+
+    failed = False
+    print(f"{'backend':<8} {'chunks/s':>10} {'mean cos':>10} {'min cos':>10} {'max sim gap':>12}")
+    for backend in args.backends:
+        service = reference if backend == 'torch' else EmbeddingService(
+            backend=backend, num_threads=args.threads, batch_size=args.batch_size
+        )
+        throughput = benchmark(service, texts, args.repeats)
+        stats = compare_embeddings(reference_embeddings, np.asarray(service.generate_embeddings(accuracy_texts)))
+        print(f"{backend:<8} {throughput:>10.1f} {stats['mean_cosine']:>10.4f} "
+              f"{stats['min_cosine']:>10.4f} {stats['max_similarity_gap']:>12.4f}")
+        if stats['min_cosine'] < args.min_cosine:
+            failed = True
+            print(f"  {backend}: accuracy below threshold ({stats['min_cosine']:.4f} < {args.min_cosine})")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
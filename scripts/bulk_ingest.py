@@ -0,0 +1,279 @@
+"""
+Offline bulk loader for large document archives.
+
+Usage (from the project root):
+    python -m scripts.bulk_ingest /archive --user-id 1 --workers 8
+
+Files are parsed by DocumentProcessor in a process pool while the main
+process feeds one EmbeddingService with large encode batches and writes
+documents, chunks and vectors in bulk. Progress is appended to a
+checkpoint file (one JSON line per file), so an interrupted run can simply
+be restarted; files that failed are tried again. Files whose SHA-256
+already exists for the user are skipped.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+from werkzeug.utils import secure_filename
+
+from scripts._app import UPLOAD_FOLDER, create_cli_app
+from src.models.user import db, User
+from src.models.document import Document, DocumentChunk
+from src.utils.document_processor import DocumentProcessor, EmbeddingService, VectorStore
+
+_worker_processor = None
+_worker_known_hashes = frozenset()
+
+
+def _init_worker(known_hashes):
+    global _worker_processor, _worker_known_hashes
+    _worker_processor = DocumentProcessor()
+    _worker_known_hashes = known_hashes
+
+
+def _extract(path: str) -> dict:
+    """Hash and parse one file in a pool worker"""
+    try:
+        file_hash = _worker_processor.calculate_file_hash(path)
+    except OSError as e:
+        # Broken symlinks and unreadable files fail this file, not the run
+        return _failed(path, str(e))
+    if file_hash in _worker_known_hashes:
+        return {'path': path, 'hash': file_hash, 'duplicate': True}
+    result = _worker_processor.process_document(path, os.path.basename(path))
+    return {'path': path, 'hash': file_hash, 'duplicate': False, 'result': result}
+
+
+def _failed(path: str, error: str) -> dict:
+    return {'path': path, 'hash': None, 'duplicate': False, 'result': {'success': False, 'error': error}}
+
+
+def find_files(root: str, processor: DocumentProcessor):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if processor.is_supported_format(name):
+                yield os.path.join(dirpath, name)
+
+
+def load_checkpoint(path: str) -> set:
+    """Paths that need no further work; failed files are retried on the next run"""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry['status'] in ('ingested', 'duplicate'):
+                    done.add(entry['path'])
+    return done
+
+
+class BulkIngester:
+    """Buffers parsed documents and flushes them with one encode call and bulk writes"""
+
+    def __init__(self, user_id: int, embedding_service: EmbeddingService, vector_store: VectorStore,
+                 checkpoint, encode_batch: int):
+        self.user_id = user_id
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.checkpoint = checkpoint
+        self.encode_batch = encode_batch
+        self.pending = []
+        self.pending_chunks = 0
+        self.seen_hashes = set()
+        self.stats = {'ingested': 0, 'duplicate': 0, 'failed': 0, 'chunks': 0}
+
+    def record(self, path: str, status: str, **extra):
+        self.stats[status] += 1
+        self.checkpoint.write(json.dumps({'path': path, 'status': status, **extra}) + "\n")
+
+    def handle(self, item: dict):
+        if item['duplicate'] or item['hash'] in self.seen_hashes:
+            self.record(item['path'], 'duplicate', hash=item['hash'])
+            return
+        result = item['result']
+        if not result.get('success'):
+            self.record(item['path'], 'failed', error=result.get('error'))
+            return
+
+        self.seen_hashes.add(item['hash'])
+        self.pending.append(item)
+        self.pending_chunks += len(result['chunks'])
+        if self.pending_chunks >= self.encode_batch:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        # Take the batch up front: if writing it fails, flushing again on the
+        # way out must not retry it. Its files are not in the checkpoint, so
+        # the next run picks them up.
+        batch, self.pending, self.pending_chunks = self.pending, [], 0
+
+        pending = []
+        records = []
+        for item in batch:
+            filename = secure_filename(os.path.basename(item['path']))
+            save_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4()}_{filename}")
+            try:
+                shutil.copyfile(item['path'], save_path)
+            except OSError as e:
+                self.record(item['path'], 'failed', error=str(e))
+                continue
+            pending.append(item)
+            records.append(Document(
+                user_id=self.user_id,
+                filename=filename,
+                file_type=os.path.splitext(filename)[1].lower(),
+                file_size=os.path.getsize(save_path),
+                file_path=save_path,
+                processing_status='processing',
+                document_hash=item['hash'],
+                extracted_text=item['result']['extracted_text']
+            ))
+        if not records:
+            return
+
+        texts = [chunk['text'] for item in pending for chunk in item['result']['chunks']]
+        embeddings = self.embedding_service.generate_embeddings(texts)
+
+        db.session.add_all(records)
+        db.session.flush()  # assign document IDs
+
+        chunk_rows = []
+        vector_items = []
+        offset = 0
+        for item, record in zip(pending, records):
+            chunks = item['result']['chunks']
+            chunk_rows.extend(
+                {
+                    'document_id': record.id,
+                    'chunk_text': chunk['text'],
+                    'chunk_order': idx,
+                    'page_number': chunk.get('page_number'),
+                    'section_type': chunk.get('section_type')
+                }
+                for idx, chunk in enumerate(chunks)
+            )
+            vector_items.append((record.id, chunks, embeddings[offset:offset + len(chunks)]))
+            offset += len(chunks)
+        db.session.bulk_insert_mappings(DocumentChunk, chunk_rows)
+
+        # Commit the rows before writing vectors so their IDs can never be
+        # handed out again. Documents stay 'processing' until their vectors
+        # exist; after a crash the reconciler purges them and a re-run
+        # ingests the files again.
+        db.session.commit()
+        self.vector_store.add_many(vector_items, user_id=self.user_id)
+        Document.query.filter(Document.id.in_([record.id for record in records])).update(
+            {'processing_status': 'completed', 'processing_completed_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.session.commit()
+
+        for item, record in zip(pending, records):
+            self.record(item['path'], 'ingested', hash=item['hash'], document_id=record.id)
+        self.checkpoint.flush()
+        self.stats['chunks'] += len(texts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory')
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--encode-batch', type=int, default=1024,
+                        help='chunks collected before each encode call and bulk write')
+    parser.add_argument('--batch-size', type=int, default=128, help='EmbeddingService batch size')
+    parser.add_argument('--checkpoint', default=None,
+                        help='progress file (default: <directory>/.bulk_ingest_checkpoint.jsonl)')
+    parser.add_argument('--report-every', type=float, default=5.0, help='seconds between progress lines')
+    args = parser.parse_args(argv)
+
+    checkpoint_path = args.checkpoint or os.path.join(args.directory, '.bulk_ingest_checkpoint.jsonl')
+    done = load_checkpoint(checkpoint_path)
+    processor = DocumentProcessor()
+    paths = [p for p in find_files(args.directory, processor) if p not in done]
+    print(f"{len(paths)} files to ingest ({len(done)} already in checkpoint)")
+
+    app = create_cli_app()
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    with app.app_context():
+        if not User.query.get(args.user_id):
+            raise SystemExit(f"User {args.user_id} not found")
+        known_hashes = frozenset(
+            h for (h,) in db.session.query(Document.document_hash)
+            .filter(Document.user_id == args.user_id, Document.document_hash.isnot(None),
+                    Document.processing_status == 'completed')
+        )
+
+        # Workers come from a fork server, so they never inherit the model or torch thread pools
+        embedding_service = EmbeddingService(batch_size=args.batch_size)
+        vector_store = VectorStore()
+        started = last_report = time.monotonic()
+
+        with open(checkpoint_path, 'a') as checkpoint, \
+                ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('forkserver'),
+                                    initializer=_init_worker, initargs=(known_hashes,)) as executor:
+            ingester = BulkIngester(args.user_id, embedding_service, vector_store, checkpoint, args.encode_batch)
+            remaining = iter(paths)
+            in_flight = set()
+            window = args.workers * 4  # bound parsed-but-unencoded results held in memory
+
+            paths_by_future = {}
+
+            def refill():
+                for path in remaining:
+                    future = executor.submit(_extract, path)
+                    paths_by_future[future] = path
+                    in_flight.add(future)
+                    if len(in_flight) >= window:
+                        break
+
+            try:
+                refill()
+                while in_flight:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        in_flight.discard(future)
+                        path = paths_by_future.pop(future)
+                        try:
+                            item = future.result()
+                        except Exception as e:
+                            item = _failed(path, f"{type(e).__name__}: {e}")
+                        ingester.handle(item)
+                    refill()
+
+                    now = time.monotonic()
+                    if now - last_report >= args.report_every:
+                        last_report = now
+                        elapsed = now - started
+                        stats = ingester.stats
+                        files = stats['ingested'] + stats['duplicate'] + stats['failed'] + len(ingester.pending)
+                        print(f"[{elapsed:7.0f}s] {files}/{len(paths)} files  "
+                              f"{files / elapsed:.1f} files/s  {stats['chunks'] / elapsed:.0f} chunks/s  "
+                              f"ingested={stats['ingested']} duplicate={stats['duplicate']} failed={stats['failed']}",
+                              flush=True)
+            finally:
+                # Keep everything parsed so far, even when the run is interrupted
+                ingester.flush()
+
+    elapsed = time.monotonic() - started
+    stats = ingester.stats
+    print(f"Done in {elapsed:.0f}s: ingested={stats['ingested']} duplicate={stats['duplicate']} "
+          f"failed={stats['failed']} chunks={stats['chunks']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Open-loop load generator and traffic replayer for the Flask API.
+
+Usage (from the project root):
+    # spawn a throwaway server with the stub model and sweep offered load
+    python -m scripts.loadtest --spawn --stub-model --rates 5 10 20 40 --duration 30
+
+    # drive an existing deployment with a custom mix
+    python -m scripts.loadtest --url http://host:5000/api --rates 20 \\
+        --mix ask=0.7 list_documents=0.2 list_conversations=0.05 upload=0.05
+
+    # save the generated schedule, then replay it later at twice the speed
+    python -m scripts.loadtest --spawn --stub-model --rates 10 --record traffic.jsonl
+    python -m scripts.loadtest --spawn --stub-model --replay traffic.jsonl --speed 2
+
+Arrivals are Poisson at the offered rate and are dispatched on schedule
+whether or not earlier requests have finished (open loop). Latency is
+measured from the scheduled send time, so time spent waiting for a free
+client counts. Each run seeds its own users and documents first. For every
+offered rate the report gives per-endpoint latency percentiles, error rate
+and achieved throughput. Read down the rates to see where the server
+saturates.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ('upload', 'ask', 'list_documents', 'list_conversations')
+DEFAULT_MIX = {'ask': 0.6, 'list_documents': 0.2, 'list_conversations': 0.15, 'upload': 0.05}
+
+TOPICS = ['delivery', 'penalty', 'payment', 'warranty', 'termination', 'liability', 'confidentiality', 'pricing']
+QUESTIONS = [
+    'What is the {t} clause?',
+    'How many days are allowed for {t}?',
+    'When does the {t} apply?',
+    'Who is responsible for {t}?',
+    'And what about the {t}?',
+]
+
+
+def make_docx(paragraphs):
+    """Build a minimal DOCX (just word/document.xml) in memory"""
+    ns = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    body = ''.join(f'<w:p><w:r><w:t>{p}</w:t></w:r></w:p>' for p in paragraphs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{ns}"><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+
+def synthetic_document(rng: random.Random, paragraphs: int = 40):
+    lines = []
+    for i in range(paragraphs):
+        topic = rng.choice(TOPICS)
+        lines.append(
+            f"Clause {i + 1} covers {topic}. The supplier shall handle {topic} within {rng.randint(1, 60)} days "
+            f"of notice, and a penalty of {rng.randint(1, 20) * 50} dollars applies for each day of delay."
+        )
+    return make_docx(lines)
+
+
+class ApiClient:
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: bytes = None, headers: dict = None):
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.read()
+
+    def json(self, method: str, path: str, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        return self.request(method, path, body, {'Content-Type': 'application/json'} if body else {})
+
+    def upload(self, user_id: int, filename: str, content: bytes):
+        boundary = uuid.uuid4().hex
+        parts = [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="user_id"\r\n\r\n{user_id}\r\n'.encode(),
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode(),
+            content,
+            f'\r\n--{boundary}--\r\n'.encode(),
+        ]
+        return self.request('POST', '/documents/upload', b''.join(parts),
+                            {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+
+class Fixture:
+    """Users and documents created before the run so requests have targets"""
+
+    def __init__(self, client: ApiClient, users: int, documents_per_user: int, rng: random.Random):
+        self.user_ids = []
+        self.documents = {}
+        run_tag = uuid.uuid4().hex[:8]
+        for i in range(users):
+            status, body = client.json('POST', '/users', {'username': f'load_{run_tag}_{i}', 'email': f'load_{run_tag}_{i}@example.com'})
+            if status != 201:
+                raise SystemExit(f"Could not create user: {status} {body[:200]!r}")
+            user_id = json.loads(body)['id']
+            self.user_ids.append(user_id)
+            self.documents[user_id] = []
+            for j in range(documents_per_user):
+                status, body = client.upload(user_id, f'seed_{j}.docx', synthetic_document(rng))
+                if status != 200:
+                    raise SystemExit(f"Could not seed document: {status} {body[:200]!r}")
+                self.documents[user_id].append(json.loads(body)['document']['id'])
+
+
+def build_request(event: dict, fixture: Fixture, rng: random.Random):
+    """Turn a schedule event into a callable that performs the request"""
+    user_id = fixture.user_ids[event['user'] % len(fixture.user_ids)]
+    endpoint = event['endpoint']
+    if endpoint == 'ask':
+        docs = fixture.documents[user_id]
+        payload = {
+            'question': event.get('question') or rng.choice(QUESTIONS).format(t=rng.choice(TOPICS)),
+            'document_id': docs[event.get('document', 0) % len(docs)],
+            'user_id': user_id,
+        }
+        if event.get('session'):
+            payload['session_id'] = event['session']
+        return lambda client: client.json('POST', '/qa/ask', payload)
+    if endpoint == 'upload':
+        content = synthetic_document(rng, paragraphs=event.get('paragraphs', 40))
+        return lambda client: client.upload(user_id, 'load.docx', content)
+    if endpoint == 'list_documents':
+        return lambda client: client.request('GET', f'/documents?user_id={user_id}')
+    if endpoint == 'list_conversations':
+        return lambda client: client.request('GET', f'/qa/conversations?user_id={user_id}&limit=50')
+    raise ValueError(f"Unknown endpoint in schedule: {endpoint}")
+
+
+def synthetic_schedule(rate: float, duration: float, mix: dict, users: int, rng: random.Random):
+    """Poisson arrivals over `duration` seconds; follow-up asks share a session id"""
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    sessions = {}
+    events = []
+    t = rng.expovariate(rate)
+    while t < duration:
+        endpoint = rng.choices(endpoints, weights)[0]
+        event = {'offset': round(t, 6), 'endpoint': endpoint, 'user': rng.randrange(users)}
+        if endpoint == 'ask':
+            event['document'] = rng.randrange(1 << 16)
+            if event['user'] in sessions and rng.random() < 0.5:
+                event['session'] = sessions[event['user']]
+            else:
+                event['session'] = sessions[event['user']] = uuid.uuid4().hex
+        events.append(event)
+        t += rng.expovariate(rate)
+    return events
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_schedule(events, fixture: Fixture, client: ApiClient, concurrency: int, rng: random.Random):
+    """Dispatch events on schedule (open loop) and collect per-request results"""
+    results = []
+    lock = threading.Lock()
+
+    def execute(endpoint, call, scheduled):
+        try:
+            status, _ = call(client)
+        except Exception as error:  # timeouts, refused connections
+            status = type(error).__name__
+        finished = time.perf_counter()
+        with lock:
+            results.append((endpoint, status, finished - scheduled, finished))
+
+    prepared = [(e['offset'], e['endpoint'], build_request(e, fixture, rng)) for e in events]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        for offset, endpoint, call in prepared:
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(execute, endpoint, call, scheduled)
+    elapsed = max((r[3] for r in results), default=start) - start
+    return results, elapsed
+
+
+def summarise(results, elapsed: float, offered_rate: float):
+    report = {'offered_rate': offered_rate, 'elapsed': elapsed, 'endpoints': {}}
+    for endpoint in sorted({r[0] for r in results}) + ['all']:
+        rows = [r for r in results if endpoint == 'all' or r[0] == endpoint]
+        latencies = sorted(r[2] * 1000 for r in rows)
+        statuses = {}
+        for r in rows:
+            statuses[str(r[1])] = statuses.get(str(r[1]), 0) + 1
+        errors = sum(1 for r in rows if not (isinstance(r[1], int) and 200 <= r[1] < 400))
+        report['endpoints'][endpoint] = {
+            'requests': len(rows),
+            # Every scheduled request yields one result, so this is the endpoint's share of the offered rate
+            'offered_rate': offered_rate * len(rows) / len(results) if results else 0.0,
+            'throughput': len(rows) / elapsed if elapsed else 0.0,
+            'error_rate': errors / len(rows) if rows else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p90_ms': percentile(latencies, 90),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': latencies[-1] if latencies else float('nan'),
+            'statuses': statuses,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\nOffered {report['offered_rate']:.1f} req/s over {report['elapsed']:.1f}s")
+    print(f"  {'endpoint':<20} {'reqs':>6} {'req/s':>8} {'err%':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"  {endpoint:<20} {stats['requests']:>6} {stats['throughput']:>8.1f} {stats['error_rate'] * 100:>6.1f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p90_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}  "
+              f"{json.dumps(stats['statuses'])}")
+
+
+def print_saturation(reports):
+    """One offered-vs-achieved curve per endpoint, plus the aggregate, across the swept rates"""
+    endpoints = sorted({e for report in reports for e in report['endpoints'] if e != 'all'}) + ['all']
+    for endpoint in endpoints:
+        print(f"\nSaturation curve ({'all endpoints' if endpoint == 'all' else endpoint})")
+        print(f"  {'offered':>8} {'achieved':>9} {'err%':>6} {'p50 ms':>9} {'p99 ms':>9}")
+        for report in reports:
+            stats = report['endpoints'].get(endpoint)
+            if stats is None:
+                continue
+            print(f"  {stats['offered_rate']:>8.1f} {stats['throughput']:>9.1f} {stats['error_rate'] * 100:>6.1f} "
+                  f"{stats['p50_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+
+def spawn_server(port: int, workers: int, stub_model: bool, workdir: str):
+    """Start gunicorn against throwaway database, vector store and upload paths"""
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'WEB_CONCURRENCY': str(workers),
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        'CHROMA_DB_PATH': os.path.join(workdir, 'chroma_db'),
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+    })
+    if stub_model:
+        env['EMBEDDING_BACKEND'] = 'stub'
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=PROJECT_ROOT, env=env
+    )
+    client = ApiClient(f'http://127.0.0.1:{port}/api', timeout=2)
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            status, _ = client.request('GET', '/health/ready')
+            if status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("Server did not become ready in time")
+
+
+def parse_mix(items):
+    if not items:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition('=')
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='API base URL of a running server, e.g. http://localhost:5000/api')
+    target.add_argument('--spawn', action='store_true', help='start a throwaway local server for the run')
+    parser.add_argument('--stub-model', action='store_true', help='with --spawn: use the hashing stub instead of the model')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--workers', type=int, default=2, help='with --spawn: gunicorn worker processes')
+    parser.add_argument('--rates', type=float, nargs='+', default=[5.0], help='offered request rates to sweep (req/s)')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds per rate')
+    parser.add_argument('--mix', nargs='*', help='endpoint=weight pairs (default: %s)' % DEFAULT_MIX)
+    parser.add_argument('--replay', help='JSONL schedule to replay instead of synthetic traffic')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed-up factor')
+    parser.add_argument('--record', help='write the generated schedule(s) to this JSONL file')
+    parser.add_argument('--concurrency', type=int, default=64, help='maximum requests in flight')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--documents-per-user', type=int, default=2)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the full report to this file')
+    args = parser.parse_args(argv)
+
+    if args.record and len(args.rates) > 1 and not args.replay:
+        parser.error('--record needs a single --rates value')
+
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    workdir = server = None
+    if args.spawn:
+        workdir = tempfile.mkdtemp(prefix='loadtest_')
+        server = spawn_server(args.port, args.workers, args.stub_model, workdir)
+        base_url = f'http://127.0.0.1:{args.port}/api'
+    else:
+        base_url = args.url
+
+    try:
+        client = ApiClient(base_url, args.timeout)
+        print(f"Seeding {args.users} users x {args.documents_per_user} documents ...")
+        fixture = Fixture(client, args.users, args.documents_per_user, rng)
+
+        if args.replay:
+            with open(args.replay) as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            for event in events:
+                event['offset'] /= args.speed
+            duration = max((e['offset'] for e in events), default=0.0)
+            schedules = [(len(events) / duration if duration else 0.0, events)]
+        else:
+            schedules = [(rate, synthetic_schedule(rate, args.duration, mix, args.users, rng)) for rate in args.rates]
+
+        if args.record:
+            with open(args.record, 'w') as f:
+                for _, events in schedules:
+                    for event in events:
+                        f.write(json.dumps(event) + "\n")
+
+        reports = []
+        for rate, events in schedules:
+            results, elapsed = run_schedule(events, fixture, client, args.concurrency, rng)
+            report = summarise(results, elapsed, rate)
+            print_report(report)
+            reports.append(report)
+        if len(reports) > 1:
+            print_saturation(reports)
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(reports, f, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Move vectors indexed before per-user partitioning into their owners' collections.
+
+Usage (from the project root):
+    python -m scripts.partition_vectors
+    python -m scripts.partition_vectors --batch-size 2000
+
+Chunks in the shared ``document_chunks`` collection are copied into
+``user_<id>_chunks`` for the owner recorded in the database
+(``document.user_id``) and then removed from the shared collection, so
+library search finds them. Copies are upserts, so an interrupted run can
+simply be repeated. Chunks whose document no longer exists are left for the
+reconciler.
+"""
+import argparse
+import sys
+from collections import defaultdict
+
+from scripts._app import create_cli_app
+from src.models.user import db
+from src.models.document import Document
+from src.utils.document_processor import VectorStore
+
+
+def partition_vectors(vector_store: VectorStore, owners: dict, batch_size: int) -> dict:
+    """Move shared-collection chunks to per-user collections; `owners` maps document_id -> user_id"""
+    shared = vector_store.collection
+    batch_size = min(batch_size, vector_store.client.get_max_batch_size())
+    report = {'moved': 0, 'orphaned': 0, 'users': set()}
+    offset = 0  # chunks that stay behind (orphans) are skipped on the next page
+    while True:
+        page = shared.get(include=['embeddings', 'documents', 'metadatas'], limit=batch_size, offset=offset)
+        if not page['ids']:
+            break
+
+        by_user = defaultdict(lambda: {'ids': [], 'embeddings': [], 'documents': [], 'metadatas': []})
+        for i, (chunk_id, metadata) in enumerate(zip(page['ids'], page['metadatas'])):
+            user_id = owners.get(metadata.get('document_id'))
+            if user_id is None:
+                report['orphaned'] += 1
+                offset += 1
+                continue
+            group = by_user[user_id]
+            group['ids'].append(chunk_id)
+            group['embeddings'].append(page['embeddings'][i])
+            group['documents'].append(page['documents'][i])
+            group['metadatas'].append(metadata)
+
+        for user_id, group in by_user.items():
+            vector_store.get_user_collection(user_id).upsert(**group)
+            # Delete only after the copy is written, so a crash never loses vectors
+            shared.delete(ids=group['ids'])
+            report['moved'] += len(group['ids'])
+            report['users'].add(user_id)
+
+    report['users'] = len(report['users'])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=5000, help='chunks read from the shared collection at a time')
+    args = parser.parse_args(argv)
+
+    app = create_cli_app()
+    with app.app_context():
+        owners = dict(db.session.query(Document.id, Document.user_id))
+    report = partition_vectors(VectorStore(), owners, args.batch_size)
+    print(f"Moved {report['moved']} chunks into {report['users']} user collections; "
+          f"{report['orphaned']} chunks without a document left in place")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
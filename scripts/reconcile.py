@@ -0,0 +1,34 @@
+"""
+Purge stalled documents and orphaned vectors, chunk rows and upload files.
+
+Usage (from the project root):
+    python -m scripts.reconcile                 # one pass
+    python -m scripts.reconcile --grace 600     # treat anything older than 10 minutes as settled
+
+The API server can also run this periodically in the background; see
+RECONCILE_INTERVAL in the README.
+"""
+import argparse
+import json
+import sys
+
+from scripts._app import UPLOAD_FOLDER, create_cli_app
+from src.utils.document_processor import VectorStore
+from src.utils.reconciler import Reconciler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--grace', type=float, default=3600,
+                        help='seconds an orphan must have existed before it is purged')
+    args = parser.parse_args(argv)
+
+    app = create_cli_app()
+    with app.app_context():
+        report = Reconciler(VectorStore(), UPLOAD_FOLDER, grace_seconds=args.grace).run_once()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Export and import index snapshots for bootstrapping replicas.
+
+Usage (from the project root):
+    python -m scripts.snapshot export /backups/snap-2026-10-19
+    python -m scripts.snapshot import /backups/snap-2026-10-19
+
+A snapshot directory contains:
+    manifest.json       counts, embedding dimension and format version
+    users.parquet       user rows
+    documents.parquet   document rows, including extracted text
+    chunks.parquet      document_chunk rows
+    vector_ids.parquet  one row per vector: id, collection, document_id, text, metadata
+    vectors.f32         float32 embeddings, row-major, aligned with vector_ids
+    uploads/            original upload files (unless --no-files)
+
+Vectors are exported only for documents present in the database export, so
+the two halves always agree. Importing needs no parsing or re-encoding.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from scripts._app import UPLOAD_FOLDER, create_cli_app
+from src.config import sqlite_database_path
+from src.models.user import db, User
+from src.models.document import Document, DocumentChunk
+from src.utils.document_processor import EmbeddingService, VectorStore
+
+SNAPSHOT_VERSION = 1
+VECTOR_METADATA = ('page_number', 'section_type', 'length', 'created_at')
+
+
+def _read_consistent_tables(document_status: str = 'completed'):
+    """
+    Read users, documents and chunks from a point-in-time copy of the SQLite
+    database (backup API), so a concurrent upload cannot split the export
+    """
+    source = sqlite3.connect(sqlite_database_path())
+    copy = sqlite3.connect(':memory:')
+    try:
+        source.backup(copy)
+        users = pd.read_sql_query(f'SELECT * FROM "{User.__tablename__}"', copy)
+        documents = pd.read_sql_query(
+            f'SELECT * FROM "{Document.__tablename__}" WHERE processing_status = ?', copy, params=(document_status,)
+        )
+        chunks = pd.read_sql_query(
+            f'SELECT c.* FROM "{DocumentChunk.__tablename__}" c '
+            f'JOIN "{Document.__tablename__}" d ON d.id = c.document_id WHERE d.processing_status = ?',
+            copy, params=(document_status,)
+        )
+    finally:
+        copy.close()
+        source.close()
+    return users, documents, chunks
+
+
+def _document_collections(vector_store: VectorStore, documents: pd.DataFrame):
+    """
+    Yield (name, collection, document_ids) for every existing collection that
+    can hold exported vectors. Each user partition is only asked for its own
+    documents, and no collection is created along the way.
+    """
+    existing = {collection.name: collection for collection in vector_store.iter_chunk_collections()}
+    shared = vector_store.collection
+    if shared.count():
+        # Documents uploaded before partitioning may belong to any user
+        yield shared.name, shared, [int(i) for i in documents['id']]
+    for user_id, user_documents in documents.groupby('user_id'):
+        name = f"user_{int(user_id)}_chunks"
+        if name in existing:
+            yield name, existing[name], [int(i) for i in user_documents['id']]
+
+
+def export_snapshot(out_dir: str, include_files: bool = True, batch_documents: int = 500):
+    os.makedirs(out_dir, exist_ok=False)
+    vector_store = VectorStore()
+    started = time.time()
+
+    users, documents, chunks = _read_consistent_tables()
+
+    users.to_parquet(os.path.join(out_dir, 'users.parquet'), index=False)
+    documents.to_parquet(os.path.join(out_dir, 'documents.parquet'), index=False)
+    chunks.to_parquet(os.path.join(out_dir, 'chunks.parquet'), index=False)
+
+    vector_rows = []
+    dimension = None
+    with open(os.path.join(out_dir, 'vectors.f32'), 'wb') as vectors_file:
+        for name, collection, document_ids in _document_collections(vector_store, documents):
+            for start in range(0, len(document_ids), batch_documents):
+                batch = document_ids[start:start + batch_documents]
+                result = collection.get(
+                    where={'document_id': {'$in': batch}},
+                    include=['embeddings', 'documents', 'metadatas']
+                )
+                if not result['ids']:
+                    continue
+                embeddings = np.asarray(result['embeddings'], dtype=np.float32)
+                dimension = embeddings.shape[1]
+                embeddings.tofile(vectors_file)
+                for chunk_id, text, metadata in zip(result['ids'], result['documents'], result['metadatas']):
+                    row = {'id': chunk_id, 'collection': name, 'document_id': metadata['document_id'], 'text': text}
+                    row.update({key: metadata.get(key) for key in VECTOR_METADATA})
+                    vector_rows.append(row)
+
+    vector_ids = pd.DataFrame(vector_rows, columns=['id', 'collection', 'document_id', 'text', *VECTOR_METADATA])
+    vector_ids = vector_ids.astype({'document_id': 'Int64', 'page_number': 'Int64', 'length': 'Int64', 'created_at': 'Int64'})
+    vector_ids.to_parquet(os.path.join(out_dir, 'vector_ids.parquet'), index=False)
+
+    copied_files = 0
+    if include_files:
+        files_dir = os.path.join(out_dir, 'uploads')
+        os.makedirs(files_dir)
+        for path in documents['file_path']:
+            if path and os.path.exists(path):
+                shutil.copy2(path, os.path.join(files_dir, os.path.basename(path)))
+                copied_files += 1
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'created_at': datetime.utcnow().isoformat(),
+        'users': len(users),
+        'documents': len(documents),
+        'chunks': len(chunks),
+        'vectors': len(vector_rows),
+        'dimension': dimension,
+        'files': copied_files,
+        'embedding_model': os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'),
+        'embedding_backend': os.environ.get('EMBEDDING_BACKEND', 'torch'),
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Exported {manifest['documents']} documents, {manifest['chunks']} chunks and "
+          f"{manifest['vectors']} vectors in {time.time() - started:.1f}s")
+    return manifest
+
+
+def _check_embedding_model(manifest: dict):
+    """Refuse vectors that this node's embedding model could not query"""
+    model = os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    if manifest['embedding_model'] != model:
+        raise SystemExit(f"Snapshot vectors come from {manifest['embedding_model']!r} "
+                         f"but this node uses EMBEDDING_MODEL={model!r}")
+    # The stub encoder's vectors are unrelated to any real model's
+    source_stub = manifest.get('embedding_backend', 'torch') == 'stub'
+    if source_stub != (os.environ.get('EMBEDDING_BACKEND', 'torch') == 'stub'):
+        raise SystemExit("Snapshot and node disagree on the stub embedding backend")
+    dimension = len(EmbeddingService().generate_single_embedding("dimension check"))
+    if manifest['dimension'] != dimension:
+        raise SystemExit(f"Snapshot vectors have dimension {manifest['dimension']} "
+                         f"but this node's model produces {dimension}")
+
+
+def import_snapshot(in_dir: str, batch_size: int = 5000):
+    with open(os.path.join(in_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest['version'] != SNAPSHOT_VERSION:
+        raise SystemExit(f"Unsupported snapshot version {manifest['version']}")
+
+    app = create_cli_app()
+    with app.app_context():
+        if Document.query.first() is not None:
+            raise SystemExit("Target database already contains documents; import into an empty node")
+    if manifest['vectors']:
+        _check_embedding_model(manifest)
+
+    vector_store = VectorStore()
+    started = time.time()
+
+    users = pd.read_parquet(os.path.join(in_dir, 'users.parquet'))
+    documents = pd.read_parquet(os.path.join(in_dir, 'documents.parquet'))
+    chunks = pd.read_parquet(os.path.join(in_dir, 'chunks.parquet'))
+
+    # Paths from the source node are meaningless here; point every document
+    # at this node's upload folder whether or not the files were exported
+    documents['file_path'] = [os.path.join(UPLOAD_FOLDER, os.path.basename(p)) for p in documents['file_path']]
+    files_dir = os.path.join(in_dir, 'uploads')
+    if os.path.isdir(files_dir):
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        for name in os.listdir(files_dir):
+            shutil.copy2(os.path.join(files_dir, name), os.path.join(UPLOAD_FOLDER, name))
+    missing = sum(1 for path in documents['file_path'] if not os.path.exists(path))
+    if missing:
+        print(f"Warning: {missing} of {len(documents)} upload files are not in {UPLOAD_FOLDER} "
+              f"(snapshot taken with --no-files?); copy them there under the same names")
+
+    with app.app_context():
+        existing_users = {u.id for u in User.query.all()}
+        users = users[~users['id'].isin(existing_users)]
+        # Rows keep their primary keys and SQLite's stored datetime strings
+        with db.engine.begin() as connection:
+            users.to_sql(User.__tablename__, connection, if_exists='append', index=False)
+            documents.to_sql(Document.__tablename__, connection, if_exists='append', index=False)
+            chunks.to_sql(DocumentChunk.__tablename__, connection, if_exists='append', index=False, chunksize=batch_size)
+
+    vector_ids = pd.read_parquet(os.path.join(in_dir, 'vector_ids.parquet'))
+    if len(vector_ids):
+        vectors = np.fromfile(os.path.join(in_dir, 'vectors.f32'), dtype=np.float32)
+        vectors = vectors.reshape(len(vector_ids), manifest['dimension'])
+        # Chroma rejects writes above its own limit, whatever --batch-size says
+        vector_batch = min(batch_size, vector_store.client.get_max_batch_size())
+        # vector_ids row i describes vectors[i]
+        for name, group in vector_ids.groupby('collection', sort=False):
+            collection = vector_store.client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+            positions = group.index.to_numpy()
+            for start in range(0, len(group), vector_batch):
+                rows = group.iloc[start:start + vector_batch]
+                metadata_rows = rows[['document_id', *VECTOR_METADATA]]
+                metadatas = [
+                    {key: value for key, value in record.items() if value is not None}
+                    for record in metadata_rows.astype(object).where(metadata_rows.notna(), None).to_dict('records')
+                ]
+                collection.add(
+                    ids=rows['id'].tolist(),
+                    documents=rows['text'].tolist(),
+                    embeddings=vectors[positions[start:start + vector_batch]].tolist(),
+                    metadatas=metadatas
+                )
+
+    print(f"Imported {len(documents)} documents, {len(chunks)} chunks and "
+          f"{len(vector_ids)} vectors in {time.time() - started:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='write a snapshot of this node')
+    export_parser.add_argument('directory')
+    export_parser.add_argument('--no-files', action='store_true', help='skip copying upload files')
+    import_parser = subparsers.add_parser('import', help='load a snapshot into an empty node')
+    import_parser.add_argument('directory')
+    import_parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        export_snapshot(args.directory, include_files=not args.no_files)
+    else:
+        import_snapshot(args.directory, batch_size=args.batch_size)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from sqlalchemy.engine import make_url
+
+# Storage locations shared by the API server (main.py) and the command line
+# tools in scripts/, so both always operate on the same data. Each can be
+# overridden through the environment.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATABASE_URI = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(PROJECT_ROOT, 'database', 'app.db')}"
+)
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(PROJECT_ROOT, 'src', 'uploads'))
+CHROMA_DB_PATH = os.environ.get('CHROMA_DB_PATH', './chroma_db')
+ARCHIVE_FOLDER = os.environ.get(
+    'ARCHIVE_FOLDER', os.path.join(PROJECT_ROOT, 'database', 'archive', 'conversations')
+)
+
+# Server sizing, read by gunicorn.conf.py and used to size the admission
+# controller's pools so they fit inside each worker's thread pool
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+WORKER_THREADS = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+
+def sqlite_database_path() -> str:
+    """Filesystem path of the SQLite database behind DATABASE_URI"""
+    url = make_url(DATABASE_URI)
+    if url.get_backend_name() != 'sqlite' or not url.database:
+        raise ValueError(f"Expected a file-backed SQLite DATABASE_URL, got {DATABASE_URI}")
+    return url.database
+
+
+def reconciler_lock_path() -> str:
+    """
+    Lock file that lets one server process per interval run the reconciler.
+    Kept next to the SQLite database (never in the upload folder, which the
+    reconciler sweeps), or in the temp directory for other databases.
+    """
+    override = os.environ.get('RECONCILER_LOCK')
+    if override:
+        return override
+    try:
+        database = sqlite_database_path()
+    except ValueError:
+        database = None
+    if not database or database == ':memory:':
+        return os.path.join(tempfile.gettempdir(), 'reconciler.lock')
+    return os.path.join(os.path.dirname(os.path.abspath(database)), 'reconciler.lock')
@@ -68,6 +68,12 @@ class Conversation(db.Model):
     sources_cited = db.Column(db.Text)  # JSON string of chunk IDs
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_conversation_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_conversation_document_timestamp', 'document_id', 'timestamp'),
+        db.Index('ix_conversation_timestamp', 'timestamp'),
+    )
+
     def __repr__(self):
         return f'<Conversation {self.id}>'
 
@@ -83,3 +89,12 @@ class Conversation(db.Model):
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
 
+
+def create_missing_indexes():
+    """
+    db.create_all() skips tables that already exist, so indexes added to a
+    model later never reach an existing database. Create any that are missing.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
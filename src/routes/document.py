@@ -3,19 +3,21 @@ import uuid
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 
+from src.config import UPLOAD_FOLDER
 from src.models.user import db, User
-from src.models.document import Document, DocumentChunk
-from src.utils.document_processor import DocumentProcessor, EmbeddingService, VectorStore
+from src.models.document import Document, DocumentChunk, Conversation
+from src.utils.admission import admission
+from src.utils.document_processor import DocumentProcessor
+from src.utils.services import get_embedding_service, get_vector_store
 
 
 document_bp = Blueprint('document', __name__)
 
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 doc_processor = DocumentProcessor()
-embedding_service = EmbeddingService()
-vector_store = VectorStore()
+embedding_service = get_embedding_service()
+vector_store = get_vector_store()
 
 
 @document_bp.route('/documents', methods=['GET'])
@@ -45,53 +47,57 @@ def upload_document():
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    filename = secure_filename(file.filename)
-    file_id = str(uuid.uuid4())
-    save_path = os.path.join(UPLOAD_FOLDER, f"{file_id}_{filename}")
-    file.save(save_path)
-
-    file_size = os.path.getsize(save_path)
-    file_type = os.path.splitext(filename)[1].lower()
-
-    doc_record = Document(
-        user_id=user_id,
-        filename=filename,
-        file_type=file_type,
-        file_size=file_size,
-        file_path=save_path,
-        processing_status='processing'
-    )
-    db.session.add(doc_record)
-    db.session.commit()
-
-    # Process file
-    result = doc_processor.process_document(save_path, filename)
-    if not result.get('success'):
-        doc_record.processing_status = 'failed'
+    with admission.admit('ingest', user_id):
+        filename = secure_filename(file.filename)
+        file_id = str(uuid.uuid4())
+        save_path = os.path.join(UPLOAD_FOLDER, f"{file_id}_{filename}")
+        file.save(save_path)
+
+        file_size = os.path.getsize(save_path)
+        file_type = os.path.splitext(filename)[1].lower()
+
+        doc_record = Document(
+            user_id=user_id,
+            filename=filename,
+            file_type=file_type,
+            file_size=file_size,
+            file_path=save_path,
+            processing_status='processing',
+            document_hash=doc_processor.calculate_file_hash(save_path)
+        )
+        db.session.add(doc_record)
         db.session.commit()
-        return jsonify({'error': result.get('error', 'processing failed')}), 500
 
-    doc_record.extracted_text = result['extracted_text']
-    doc_record.processing_status = 'completed'
-    doc_record.processing_completed_at = db.func.current_timestamp()
-    db.session.commit()
+        # Process file
+        result = doc_processor.process_document(save_path, filename)
+        if not result.get('success'):
+            doc_record.processing_status = 'failed'
+            db.session.commit()
+            return jsonify({'error': result.get('error', 'processing failed')}), 500
+
+        doc_record.extracted_text = result['extracted_text']
+        embeddings = embedding_service.generate_embeddings([c['text'] for c in result['chunks']])
+
+        for idx, chunk in enumerate(result['chunks']):
+            chunk_record = DocumentChunk(
+                document_id=doc_record.id,
+                chunk_text=chunk['text'],
+                chunk_order=idx,
+                page_number=chunk.get('page_number'),
+                section_type=chunk.get('section_type')
+            )
+            db.session.add(chunk_record)
+        db.session.commit()
 
-    embeddings = embedding_service.generate_embeddings([c['text'] for c in result['chunks']])
+        vector_store.add_chunks(doc_record.id, result['chunks'], embeddings, user_id=user_id)
 
-    for idx, chunk in enumerate(result['chunks']):
-        chunk_record = DocumentChunk(
-            document_id=doc_record.id,
-            chunk_text=chunk['text'],
-            chunk_order=idx,
-            page_number=chunk.get('page_number'),
-            section_type=chunk.get('section_type')
-        )
-        db.session.add(chunk_record)
-    db.session.commit()
-
-    vector_store.add_chunks(doc_record.id, result['chunks'], embeddings)
+        # Only now is the document searchable; if we crash before this point
+        # the reconciler purges it as a stalled upload
+        doc_record.processing_status = 'completed'
+        doc_record.processing_completed_at = db.func.current_timestamp()
+        db.session.commit()
 
-    return jsonify({'document': doc_record.to_dict()})
+        return jsonify({'document': doc_record.to_dict()})
 
 
 @document_bp.route('/documents/<int:doc_id>/status', methods=['GET'])
@@ -103,7 +109,18 @@ def document_status(doc_id):
 @document_bp.route('/documents/<int:doc_id>', methods=['DELETE'])
 def delete_document(doc_id):
     doc = Document.query.get_or_404(doc_id)
-    vector_store.delete_document_chunks(doc.id)
+    vector_store.delete_document_chunks(doc.id, user_id=doc.user_id)
+    file_path = doc.file_path
+
+    # Bulk-delete children instead of loading them for the ORM cascade
+    DocumentChunk.query.filter_by(document_id=doc.id).delete(synchronize_session=False)
+    Conversation.query.filter_by(document_id=doc.id).delete(synchronize_session=False)
     db.session.delete(doc)
     db.session.commit()
+
+    # Anything left behind here is picked up by the reconciler
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
     return '', 204
@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify
+
+from src.utils.services import is_ready
+
+health_bp = Blueprint('health', __name__)
+
+
+@health_bp.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok'})
+
+
+@health_bp.route('/health/ready', methods=['GET'])
+def readiness():
+    if not is_ready():
+        return jsonify({'status': 'warming_up'}), 503
+    return jsonify({'status': 'ready'})
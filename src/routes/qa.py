@@ -1,12 +1,36 @@
+import json
+
 from flask import Blueprint, request, jsonify
 
+from src.config import ARCHIVE_FOLDER
 from src.models.user import db, User
 from src.models.document import Document, Conversation
+from src.utils.admission import admission
+from src.utils.archive import ConversationArchive
 from src.utils.qa_service import QuestionAnsweringService
 
 qa_bp = Blueprint('qa', __name__)
 qa_service = QuestionAnsweringService()
 
+conversation_archive = ConversationArchive(ARCHIVE_FOLDER)
+
+MAX_LIBRARY_TOP_K = 50
+MAX_LIBRARY_DOCUMENTS = 100
+MAX_CONVERSATIONS = 1000
+
+
+def _bounded_int(value, default: int, maximum: int):
+    """Parse a positive integer no larger than `maximum`; None if invalid"""
+    if value is None:
+        return default
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if 1 <= number <= maximum else None
+
 
 @qa_bp.route('/qa/ask', methods=['POST'])
 def ask_question():
@@ -22,7 +46,13 @@ def ask_question():
     if not document:
         return jsonify({'error': 'Document not found'}), 404
 
-    result = qa_service.answer_question(question, document_id=document_id)
+    with admission.admit('qa', user_id):
+        result = qa_service.answer_question(
+            question,
+            document_id=document_id,
+            user_id=document.user_id,
+            session_id=data.get('session_id')
+        )
 
     conv = Conversation(
         user_id=user_id,
@@ -30,7 +60,7 @@ def ask_question():
         question=question,
         answer=result['answer'],
         confidence_score=result.get('confidence_score'),
-        sources_cited=str([s['chunk_id'] for s in result.get('sources', [])])
+        sources_cited=json.dumps([s['chunk_id'] for s in result.get('sources', [])])
     )
     db.session.add(conv)
     db.session.commit()
@@ -38,14 +68,69 @@ def ask_question():
     return jsonify(result)
 
 
+@qa_bp.route('/qa/library/search', methods=['POST'])
+def search_library():
+    data = request.get_json() or {}
+    question = data.get('question')
+    user_id = data.get('user_id')
+
+    if not question or not user_id:
+        return jsonify({'error': 'question and user_id are required'}), 400
+
+    top_k = _bounded_int(data.get('top_k'), 3, MAX_LIBRARY_TOP_K)
+    max_documents = _bounded_int(data.get('max_documents'), 10, MAX_LIBRARY_DOCUMENTS)
+    if top_k is None or max_documents is None:
+        return jsonify({
+            'error': f'top_k must be an integer from 1 to {MAX_LIBRARY_TOP_K} and '
+                     f'max_documents an integer from 1 to {MAX_LIBRARY_DOCUMENTS}'
+        }), 400
+
+    if not User.query.get(user_id):
+        return jsonify({'error': 'User not found'}), 404
+
+    with admission.admit('qa', user_id):
+        results = qa_service.search_library(
+            question,
+            user_id=user_id,
+            top_k_per_document=top_k,
+            max_documents=max_documents
+        )
+
+    documents = {d.id: d for d in Document.query.filter(Document.id.in_([r['document_id'] for r in results]))}
+    for entry in results:
+        doc = documents.get(entry['document_id'])
+        entry['filename'] = doc.filename if doc else None
+
+    return jsonify({'results': results})
+
+
 @qa_bp.route('/qa/conversations', methods=['GET'])
 def list_conversations():
     user_id = request.args.get('user_id', type=int)
     document_id = request.args.get('document_id', type=int)
+    limit = None
+    if 'limit' in request.args:
+        limit = _bounded_int(request.args['limit'], None, MAX_CONVERSATIONS)
+        if limit is None:
+            return jsonify({'error': f'limit must be an integer from 1 to {MAX_CONVERSATIONS}'}), 400
     query = Conversation.query
     if user_id:
         query = query.filter_by(user_id=user_id)
     if document_id:
         query = query.filter_by(document_id=document_id)
-    conversations = query.order_by(Conversation.timestamp.desc()).all()
-    return jsonify({'conversations': [c.to_dict() for c in conversations]})
+    query = query.order_by(Conversation.timestamp.desc())
+    if limit:
+        query = query.limit(limit)
+    conversations = [c.to_dict() for c in query.all()]
+
+    # Archived conversations are all older than the hot ones, so they go after
+    if request.args.get('include_archived', '').lower() in ('1', 'true', 'yes'):
+        remaining = limit - len(conversations) if limit else None
+        if remaining is None or remaining > 0:
+            conversations.extend(conversation_archive.read(
+                user_id=user_id,
+                document_id=document_id,
+                limit=remaining,
+                exclude_ids={c['id'] for c in conversations}
+            ))
+    return jsonify({'conversations': conversations})
@@ -0,0 +1,222 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from src.config import WEB_CONCURRENCY, WORKER_THREADS
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; mapped to HTTP 429"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available, 0 if one is available now"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Take one token; call only after wait_time() returned 0"""
+        self.tokens -= 1
+
+    def refund(self):
+        """Give back a token taken for a request that was never run"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_full(self) -> bool:
+        """A full bucket behaves exactly like a new one, so it can be dropped"""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class PoolConfig:
+    """Limits for one class of work (e.g. ingest or qa)"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, max_wait: float,
+                 per_user_concurrency: int, rate: float, burst: float, priority: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.per_user_concurrency = per_user_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.priority = priority  # lower runs first
+
+
+class AdmissionController:
+    """
+    Admission control for expensive endpoints.
+
+    Every pool has its own concurrency limit, a bounded wait queue and per-user
+    token-bucket and in-flight quotas, while all pools share one overall
+    limit. A pool may only take a shared slot when no higher-priority pool has
+    a request waiting that it could otherwise run, so interactive questions
+    are admitted ahead of queued ingestion. Limits apply per process.
+    """
+
+    EVICT_INTERVAL = 60.0  # seconds between sweeps of idle token buckets
+
+    def __init__(self, pools: Dict[str, PoolConfig], total_concurrency: int):
+        self.pools = pools
+        self.total_concurrency = total_concurrency
+        self._cond = threading.Condition()
+        self._active = {name: 0 for name in pools}
+        self._waiting = {name: 0 for name in pools}
+        self._user_inflight = {}  # running plus queued requests per (pool, user)
+        self._buckets = {}
+        self._next_eviction = time.monotonic() + self.EVICT_INTERVAL
+
+    def _bucket(self, pool: PoolConfig, user_id) -> TokenBucket:
+        now = time.monotonic()
+        if now >= self._next_eviction:
+            # Drop idle users' buckets so the table does not grow with every user ever seen
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.is_full()}
+            self._next_eviction = now + self.EVICT_INTERVAL
+        key = (pool.name, user_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(pool.rate, pool.burst)
+        return bucket
+
+    def _check_quota(self, pool: PoolConfig, user_id) -> TokenBucket:
+        """Raise if the user is over quota; the caller takes the token once the request is accepted"""
+        bucket = self._bucket(pool, user_id)
+        wait = bucket.wait_time()
+        if wait:
+            raise AdmissionRejected(f"Rate limit exceeded for {pool.name}", wait)
+        # Queued requests count too, otherwise they would all be admitted at once
+        if self._user_inflight.get((pool.name, user_id), 0) >= pool.per_user_concurrency:
+            raise AdmissionRejected(f"Too many concurrent {pool.name} requests for this user", 1)
+        return bucket
+
+    def _can_run(self, pool: PoolConfig) -> bool:
+        if self._active[pool.name] >= pool.concurrency:
+            return False
+        if sum(self._active.values()) >= self.total_concurrency:
+            return False
+        return not any(
+            self._waiting[other.name] and self._active[other.name] < other.concurrency
+            for other in self.pools.values()
+            if other.priority < pool.priority
+        )
+
+    @contextmanager
+    def admit(self, pool_name: str, user_id=None):
+        """Hold a slot in `pool_name` for the duration of the block"""
+        pool = self.pools[pool_name]
+        key = (pool.name, user_id)
+
+        with self._cond:
+            bucket = self._check_quota(pool, user_id)
+            if not self._can_run(pool) and self._waiting[pool.name] >= pool.queue_size:
+                raise AdmissionRejected(f"{pool.name} queue is full", pool.max_wait)
+            # Queued requests hold their token and per-user slot so a user cannot flood the queue
+            bucket.take()
+            self._user_inflight[key] = self._user_inflight.get(key, 0) + 1
+            if not self._can_run(pool):
+                self._waiting[pool.name] += 1
+                deadline = time.monotonic() + pool.max_wait
+                try:
+                    while not self._can_run(pool):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            bucket.refund()
+                            self._release_user(key)
+                            raise AdmissionRejected(f"Timed out waiting for a {pool.name} slot", pool.max_wait)
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting[pool.name] -= 1
+                    # A lower-priority pool may have been held back by this waiter
+                    self._cond.notify_all()
+            self._active[pool.name] += 1
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active[pool.name] -= 1
+                self._release_user(key)
+                self._cond.notify_all()
+
+    def _release_user(self, key):
+        self._user_inflight[key] -= 1
+        if not self._user_inflight[key]:
+            del self._user_inflight[key]
+
+
+def _env(name: str, default, cast=int):
+    return cast(os.environ.get(name, default))
+
+
+def controller_from_env() -> AdmissionController:
+    """
+    Build the controller from ADMISSION_* environment variables.
+
+    Defaults are sized from the server: the CPUs are split between worker
+    processes, and every running or queued request holds one of the worker's
+    GUNICORN_THREADS threads. Ingest may hold at most a quarter of them and
+    one thread is left for unadmitted endpoints, so uploads can never occupy
+    the threads questions need to reach the controller.
+    """
+    threads = WORKER_THREADS
+    total = _env('ADMISSION_TOTAL_CONCURRENCY', max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))
+    ingest_threads = max(1, threads // 4)
+    qa_threads = max(1, threads - ingest_threads - 1)
+    ingest_concurrency = _env('ADMISSION_INGEST_CONCURRENCY', min(max(1, total // 2), ingest_threads))
+    qa_concurrency = _env('ADMISSION_QA_CONCURRENCY', min(total, qa_threads))
+    pools = {
+        'qa': PoolConfig(
+            'qa',
+            concurrency=qa_concurrency,
+            queue_size=_env('ADMISSION_QA_QUEUE', max(0, qa_threads - qa_concurrency)),
+            max_wait=_env('ADMISSION_QA_MAX_WAIT', 10, float),
+            per_user_concurrency=_env('ADMISSION_QA_PER_USER', 4),
+            rate=_env('ADMISSION_QA_RATE', 2, float),
+            burst=_env('ADMISSION_QA_BURST', 10, float),
+            priority=0
+        ),
+        'ingest': PoolConfig(
+            'ingest',
+            concurrency=ingest_concurrency,
+            queue_size=_env('ADMISSION_INGEST_QUEUE', max(0, ingest_threads - ingest_concurrency)),
+            max_wait=_env('ADMISSION_INGEST_MAX_WAIT', 30, float),
+            per_user_concurrency=_env('ADMISSION_INGEST_PER_USER', 2),
+            rate=_env('ADMISSION_INGEST_RATE', 0.5, float),
+            burst=_env('ADMISSION_INGEST_BURST', 5, float),
+            priority=1
+        ),
+    }
+    held = sum(pool.concurrency + pool.queue_size for pool in pools.values())
+    if held >= threads:
+        logger.warning(
+            "Admission pools can hold %d requests but workers have only %d threads; "
+            "questions may wait in the accept backlog behind uploads", held, threads
+        )
+    return AdmissionController(pools, total)
+
+admission = controller_from_env()
@@ -0,0 +1,113 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.models.user import db
+from src.models.document import Conversation
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('user_id', pa.int64()),
+    ('document_id', pa.int64()),
+    ('question', pa.string()),
+    ('answer', pa.string()),
+    ('confidence_score', pa.float64()),
+    ('sources_cited', pa.string()),
+    ('timestamp', pa.timestamp('us')),
+])
+
+
+class ConversationArchive:
+    """
+    Moves old conversations out of the hot table into zstd-compressed Parquet
+    files partitioned by month (``<root>/YYYY-MM/part-*.parquet``) and reads
+    them back on demand, newest month first, with user/document filters
+    pushed down into the Parquet scan.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def archive_older_than(self, max_age_days: float, batch_size: int = 5000) -> Dict[str, int]:
+        """Archive conversations older than max_age_days; call inside an app context"""
+        cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+        archived = 0
+        files = 0
+
+        while True:
+            batch = (Conversation.query
+                     .filter(Conversation.timestamp < cutoff)
+                     .order_by(Conversation.timestamp)
+                     .limit(batch_size)
+                     .all())
+            if not batch:
+                break
+
+            by_month = {}
+            for conv in batch:
+                by_month.setdefault(conv.timestamp.strftime('%Y-%m'), []).append(conv)
+            for month, rows in by_month.items():
+                self._write_partition(month, rows)
+                files += 1
+
+            # Rows are deleted only after their file is in place; a crash in
+            # between leaves a duplicate that reads ignore, never a lost row
+            ids = [conv.id for conv in batch]
+            Conversation.query.filter(Conversation.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            archived += len(batch)
+
+        return {'archived': archived, 'files_written': files}
+
+    def _write_partition(self, month: str, rows: List[Conversation]):
+        columns = {name: [getattr(row, name) for row in rows] for name in ARCHIVE_SCHEMA.names}
+        table = pa.Table.from_pydict(columns, schema=ARCHIVE_SCHEMA)
+        directory = os.path.join(self.root, month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{time.time_ns()}.parquet")
+        pq.write_table(table, path + '.tmp', compression='zstd')
+        os.replace(path + '.tmp', path)
+
+    def read(self, user_id: int = None, document_id: int = None, limit: int = None,
+             exclude_ids: set = None) -> List[Dict[str, Any]]:
+        """Archived conversations as dicts (Conversation.to_dict shape), newest first"""
+        if not os.path.isdir(self.root):
+            return []
+
+        exclude_ids = exclude_ids or set()
+        filters = []
+        if user_id:
+            filters.append(ds.field('user_id') == user_id)
+        if document_id:
+            filters.append(ds.field('document_id') == document_id)
+        expression = None
+        for condition in filters:
+            expression = condition if expression is None else expression & condition
+
+        results = []
+        months = sorted((m for m in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, m))), reverse=True)
+        for month in months:
+            files = [
+                os.path.join(self.root, month, name)
+                for name in os.listdir(os.path.join(self.root, month)) if name.endswith('.parquet')
+            ]
+            if not files:
+                continue
+            table = ds.dataset(files, schema=ARCHIVE_SCHEMA, format='parquet').to_table(filter=expression)
+            if table.num_rows == 0:
+                continue
+            table = table.sort_by([('timestamp', 'descending')])
+            for row in table.to_pylist():
+                if row['id'] in exclude_ids:
+                    continue
+                exclude_ids.add(row['id'])
+                row['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else None
+                results.append(row)
+                if limit and len(results) >= limit:
+                    return results
+        return results
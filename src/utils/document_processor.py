@@ -1,11 +1,20 @@
 import os
 import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
 import fitz  # PyMuPDF
 from docx import Document as DocxDocument
 import pandas as pd
 from openpyxl import load_workbook
 import re
-from typing import List, Dict, Any, Tuple
+import threading
+import time
+import zlib
+from typing import List, Dict, Any, Tuple, Iterator
+from src.config import CHROMA_DB_PATH
+
+# WordprocessingML namespace used by every element in word/document.xml
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
 
 class DocumentProcessor:
     """Handles parsing and text extraction from various document formats"""
@@ -22,7 +31,7 @@ class DocumentProcessor:
         """Calculate SHA-256 hash of the file"""
         hash_sha256 = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(1 << 20), b""):
                 hash_sha256.update(chunk)
         return hash_sha256.hexdigest()
     
@@ -78,7 +87,153 @@ class DocumentProcessor:
         }
     
     def _process_docx(self, file_path: str) -> Dict[str, Any]:
-        """Extract text from DOCX using python-docx"""
+        """Extract text from DOCX by streaming word/document.xml in reading order"""
+        extracted_parts = []
+        chunks = []
+        counts = {'paragraph': 0, 'heading': 0, 'table': 0}
+        heading = None
+        heading_used = True
+        
+        for section_type, text in self._iter_docx_blocks(file_path):
+            counts[section_type] += 1
+            if section_type == 'table':
+                extracted_parts.append(f"\n\n--- Table {counts['table']} ---\n\n{text}\n\n")
+            else:
+                extracted_parts.append(text + "\n\n")
+            
+            if section_type == 'heading':
+                if not heading_used:
+                    chunks.append(self._heading_chunk(heading))
+                heading = " ".join(text.split())
+                heading_used = False
+                continue
+            
+            # Headings are usually shorter than the chunk length filter, so
+            # they are carried on the chunks of the section they introduce
+            for chunk in self._create_chunks(text, None, section_type):
+                if heading:
+                    chunk['text'] = f"{heading}\n{chunk['text']}"
+                    chunk['length'] = len(chunk['text'])
+                    heading_used = True
+                chunks.append(chunk)
+        
+        if not heading_used:
+            chunks.append(self._heading_chunk(heading))
+        
+        return {
+            'success': True,
+            'extracted_text': "".join(extracted_parts),
+            'chunks': chunks,
+            'metadata': {
+                'total_paragraphs': counts['paragraph'] + counts['heading'],
+                'total_headings': counts['heading'],
+                'total_tables': counts['table'],
+                'format': 'DOCX'
+            }
+        }
+    
+    def _heading_chunk(self, heading: str) -> Dict[str, Any]:
+        """A heading with no text under it becomes a chunk of its own"""
+        return {'text': heading, 'page_number': None, 'section_type': 'heading', 'length': len(heading)}
+    
+    def _iter_docx_blocks(self, file_path: str) -> Iterator[Tuple[str, str]]:
+        """
+        Yield (section_type, text) for each top-level paragraph, heading and
+        table in reading order. Elements are discarded as soon as they have
+        been read, so memory stays bounded by the largest single block.
+        """
+        with zipfile.ZipFile(file_path) as archive:
+            heading_styles = self._docx_heading_styles(archive)
+            
+            with archive.open('word/document.xml') as stream:
+                body = None
+                table_depth = 0
+                rows = []
+                cells = []
+                
+                for event, elem in ET.iterparse(stream, events=('start', 'end')):
+                    tag = elem.tag
+                    if event == 'start':
+                        if tag == W_NS + 'body':
+                            body = elem
+                        elif tag == W_NS + 'tbl':
+                            table_depth += 1
+                        continue
+                    
+                    if tag == W_NS + 'p' and table_depth == 0:
+                        text = self._docx_paragraph_text(elem)
+                        if text.strip():
+                            section_type = 'heading' if self._is_docx_heading(elem, heading_styles) else 'paragraph'
+                            yield section_type, text
+                        elem.clear()
+                        if body is not None:
+                            body.clear()
+                    elif tag == W_NS + 'tc' and table_depth == 1:
+                        # Nested tables are folded into the text of the outer cell
+                        paragraphs = (self._docx_paragraph_text(p) for p in elem.iter(W_NS + 'p'))
+                        cells.append(" ".join(t.strip() for t in paragraphs if t.strip()))
+                        elem.clear()
+                    elif tag == W_NS + 'tr' and table_depth == 1:
+                        rows.append(" | ".join(cells))
+                        cells = []
+                        elem.clear()
+                    elif tag == W_NS + 'tbl':
+                        table_depth -= 1
+                        if table_depth == 0:
+                            table_text = "\n".join(rows)
+                            rows = []
+                            if table_text.strip():
+                                yield 'table', table_text
+                            elem.clear()
+                            if body is not None:
+                                body.clear()
+    
+    def _docx_heading_styles(self, archive: zipfile.ZipFile) -> set:
+        """Collect paragraph style IDs that denote headings or titles"""
+        try:
+            stream = archive.open('word/styles.xml')
+        except KeyError:
+            return set()
+        
+        heading_styles = set()
+        with stream:
+            for style in ET.parse(stream).getroot().iter(W_NS + 'style'):
+                if style.get(W_NS + 'type') != 'paragraph':
+                    continue
+                name = style.find(W_NS + 'name')
+                name = name.get(W_NS + 'val', '').lower() if name is not None else ''
+                has_outline = style.find(f'{W_NS}pPr/{W_NS}outlineLvl') is not None
+                if name.startswith('heading') or name == 'title' or has_outline:
+                    heading_styles.add(style.get(W_NS + 'styleId'))
+        return heading_styles
+    
+    def _is_docx_heading(self, paragraph, heading_styles: set) -> bool:
+        """Check whether a w:p element is styled or outlined as a heading"""
+        ppr = paragraph.find(W_NS + 'pPr')
+        if ppr is None:
+            return False
+        if ppr.find(W_NS + 'outlineLvl') is not None:
+            return True
+        style = ppr.find(W_NS + 'pStyle')
+        return style is not None and style.get(W_NS + 'val') in heading_styles
+    
+    def _docx_paragraph_text(self, paragraph) -> str:
+        """Join the visible text runs of a w:p element"""
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == W_NS + 't':
+                parts.append(node.text or '')
+            elif node.tag == W_NS + 'tab':
+                parts.append('\t')
+            elif node.tag in (W_NS + 'br', W_NS + 'cr'):
+                parts.append('\n')
+        return "".join(parts)
+    
+    def _process_docx_tree(self, file_path: str) -> Dict[str, Any]:
+        """
+        Extract text from DOCX by building the full python-docx object tree.
+        Kept as the reference path for benchmarking the streaming extractor.
+        """
         doc = DocxDocument(file_path)
         extracted_text = ""
         chunks = []
@@ -149,11 +304,8 @@ class DocumentProcessor:
     
     def _extract_table_text(self, table) -> str:
         """Extract text from a DOCX table"""
-        table_text = ""
-        for row in table.rows:
-            row_text = " | ".join(cell.text.strip() for cell in row.cells)
-            table_text += row_text + "\\n"
-        return table_text
+        rows = [" | ".join(cell.text.strip() for cell in row.cells) for row in table.rows]
+        return "".join(row + "\\n" for row in rows)
     
     def _create_chunks(self, text: str, page_number: int = None, section_type: str = 'paragraph') -> List[Dict[str, Any]]:
         """Split text into smaller chunks for better processing"""
@@ -197,34 +349,138 @@ class DocumentProcessor:
         
         return chunks
 
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'int8', 'stub')
+
+class HashingEncoder:
+    """
+    Model-free stand-in for SentenceTransformer used by the ``stub`` backend:
+    hashes words into a fixed-size, L2-normalised vector. Costs microseconds
+    per text, so load tests measure the server rather than the model.
+    """
+    
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+    
+    def encode(self, texts: List[str], batch_size: int = None, convert_to_tensor: bool = False):
+        import numpy as np
+        
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r'\w+', text.lower()):
+                digest = zlib.crc32(word.encode('utf-8'))
+                embeddings[row, digest % self.dimension] += 1.0 if digest & 1 << 31 else -1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
 class EmbeddingService:
-    """Handles text embedding generation for semantic search"""
+    """Handles text embedding generation for semantic search
+
+    The inference backend is chosen by config (``EMBEDDING_BACKEND``):
+    ``torch`` runs the reference model in eager mode, ``onnx`` runs it through
+    ONNX Runtime and ``int8`` applies dynamic int8 quantisation to its linear
+    layers. ``encode`` already sorts inputs by length before batching, so
+    each batch is padded only to its own longest text. ``stub`` replaces the
+    model with a HashingEncoder for load testing.
+    """
     
-    def __init__(self):
+    def __init__(self, model_name: str = None, backend: str = None, num_threads: int = None, batch_size: int = None):
+        self.model_name = model_name or os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+        self.backend = backend or os.environ.get('EMBEDDING_BACKEND', 'torch')
+        self.batch_size = batch_size or int(os.environ.get('EMBEDDING_BATCH_SIZE', '32'))
+        self.num_threads = num_threads or int(os.environ.get('EMBEDDING_THREADS', '0'))
+        self.model = None
+        self._model_lock = threading.Lock()
+        
+        if self.backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {self.backend}")
+        
+        if self.backend == 'stub':
+            self.model = HashingEncoder()
+            return
+        
         from sentence_transformers import SentenceTransformer
-        # Use a lightweight but effective model
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        import torch
+        
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        
+        if self.backend == 'onnx':
+            # ONNX Runtime's thread pool does not survive fork, so the session
+            # is only built on first use, in the process that will run it
+            return
+        
+        self.model = SentenceTransformer(self.model_name, device='cpu')
+        if self.backend == 'int8':
+            torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+    
+    @property
+    def fork_safe(self) -> bool:
+        """False when the model must not be built or run before a fork"""
+        return self.backend != 'onnx'
+    
+    def set_num_threads(self, num_threads: int):
+        """Set intra-op threads, e.g. once a worker knows its share of the cores"""
+        self.num_threads = num_threads
+        if self.backend == 'stub':
+            return
+        import torch
+        torch.set_num_threads(num_threads)
+        if self.backend == 'onnx':
+            # Session options are fixed at creation; rebuild on next use
+            with self._model_lock:
+                self.model = None
+    
+    def _get_model(self):
+        if self.model is None:
+            with self._model_lock:
+                if self.model is None:
+                    self.model = self._load_onnx_model()
+        return self.model
+    
+    def _load_onnx_model(self):
+        import onnxruntime
+        from sentence_transformers import SentenceTransformer
+        
+        session_options = onnxruntime.SessionOptions()
+        if self.num_threads:
+            session_options.intra_op_num_threads = self.num_threads
+        return SentenceTransformer(
+            self.model_name,
+            device='cpu',
+            backend='onnx',
+            model_kwargs={'provider': 'CPUExecutionProvider', 'session_options': session_options}
+        )
     
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a list of texts"""
         if not texts:
             return []
         
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
+        embeddings = self._get_model().encode(texts, batch_size=self.batch_size, convert_to_tensor=False)
         return embeddings.tolist()
     
     def generate_single_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
-        embedding = self.model.encode([text], convert_to_tensor=False)
+        embedding = self._get_model().encode([text], convert_to_tensor=False)
         return embedding[0].tolist()
 
 class VectorStore:
-    """Handles vector storage and similarity search using ChromaDB"""
+    """Handles vector storage and similarity search using ChromaDB
+
+    Chunks added with a ``user_id`` go into that user's own collection, so a
+    query across one user's library walks a small per-user HNSW graph rather
+    than filtering the global one. The shared ``document_chunks`` collection
+    still holds chunks indexed without an owner.
+    """
     
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(self, persist_directory: str = None):
         import chromadb
         from chromadb.config import Settings
         
+        persist_directory = persist_directory or CHROMA_DB_PATH
+        self.persist_directory = persist_directory
         self.client = chromadb.PersistentClient(
             path=persist_directory,
             settings=Settings(anonymized_telemetry=False)
@@ -233,56 +489,166 @@ class VectorStore:
             name="document_chunks",
             metadata={"hnsw:space": "cosine"}
         )
+        self.user_collections = {}
+    
+    def get_user_collection(self, user_id: int):
+        """Return the per-user partition, creating it on first use"""
+        collection = self.user_collections.get(user_id)
+        if collection is None:
+            collection = self.client.get_or_create_collection(
+                name=f"user_{user_id}_chunks",
+                metadata={"hnsw:space": "cosine"}
+            )
+            self.user_collections[user_id] = collection
+        return collection
+    
+    def find_user_collection(self, user_id: int):
+        """Return the per-user partition if it exists, without creating it"""
+        collection = self.user_collections.get(user_id)
+        if collection is None:
+            try:
+                from chromadb.errors import NotFoundError
+            except ImportError:  # chromadb < 0.6 raises ValueError
+                NotFoundError = ValueError
+            try:
+                collection = self.client.get_collection(f"user_{user_id}_chunks")
+            except (NotFoundError, ValueError):
+                return None
+            self.user_collections[user_id] = collection
+        return collection
     
-    def add_chunks(self, document_id: int, chunks: List[Dict[str, Any]], embeddings: List[List[float]]):
+    def add_chunks(self, document_id: int, chunks: List[Dict[str, Any]], embeddings: List[List[float]], user_id: int = None):
         """Add document chunks with their embeddings to the vector store"""
-        if not chunks or not embeddings:
-            return
+        self.add_many([(document_id, chunks, embeddings)], user_id=user_id)
+    
+    def add_many(self, items: List[Tuple[int, List[Dict[str, Any]], List[List[float]]]], user_id: int = None):
+        """Add the chunks of several documents, as (document_id, chunks, embeddings), in bulk writes"""
+        ids, documents, metadatas, all_embeddings = [], [], [], []
+        created_at = int(time.time())
+        for document_id, chunks, embeddings in items:
+            if not chunks or not embeddings:
+                continue
+            
+            ids.extend(f"doc_{document_id}_chunk_{i}" for i in range(len(chunks)))
+            documents.extend(chunk['text'] for chunk in chunks)
+            for chunk in chunks:
+                metadata = {
+                    'document_id': document_id,
+                    'page_number': chunk.get('page_number'),
+                    'section_type': chunk.get('section_type', 'paragraph'),
+                    'length': chunk.get('length', len(chunk['text'])),
+                    'created_at': created_at
+                }
+                # Chroma rejects None metadata values (e.g. page_number for DOCX chunks)
+                metadatas.append({key: value for key, value in metadata.items() if value is not None})
+            all_embeddings.extend(embeddings)
         
-        ids = [f"doc_{document_id}_chunk_{i}" for i in range(len(chunks))]
-        documents = [chunk['text'] for chunk in chunks]
-        metadatas = [
-            {
-                'document_id': document_id,
-                'page_number': chunk.get('page_number'),
-                'section_type': chunk.get('section_type', 'paragraph'),
-                'length': chunk.get('length', len(chunk['text']))
-            }
-            for chunk in chunks
-        ]
+        if not ids:
+            return
         
-        self.collection.add(
-            ids=ids,
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas
-        )
+        collection = self.get_user_collection(user_id) if user_id else self.collection
+        batch_size = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            collection.add(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                embeddings=all_embeddings[start:end],
+                metadatas=metadatas[start:end]
+            )
     
-    def search_similar(self, query_embedding: List[float], document_id: int = None, n_results: int = 5) -> Dict[str, Any]:
+    def search_similar(self, query_embedding: List[float], document_id: int = None, n_results: int = 5, user_id: int = None, include_embeddings: bool = False) -> Dict[str, Any]:
         """Search for similar chunks based on query embedding"""
         where_filter = {}
         if document_id:
             where_filter['document_id'] = document_id
         
-        results = self.collection.query(
+        collection = (self.find_user_collection(user_id) if user_id else None) or self.collection
+        results = self._query(collection, query_embedding, n_results, where_filter, include_embeddings)
+        
+        # Documents indexed before per-user partitions existed live in the shared collection
+        if collection is not self.collection and document_id and not results['documents']:
+            results = self._query(self.collection, query_embedding, n_results, where_filter, include_embeddings)
+        
+        return results
+    
+    def search_user_library(self, query_embedding: List[float], user_id: int, top_k_per_document: int = 3, max_documents: int = 10) -> List[Dict[str, Any]]:
+        """
+        Search every document a user owns and group the hits by document.
+        Documents are ordered by their best hit; each keeps its top-k chunks.
+        """
+        collection = self.find_user_collection(user_id)
+        if collection is None:
+            return []
+        total = collection.count()
+        n_results = min(top_k_per_document * max_documents * 2, total)
+        if n_results == 0:
+            return []
+        
+        # A few large documents can fill any fixed over-fetch, so widen the
+        # search until enough documents have been seen or nothing is left
+        while True:
+            results = self._query(collection, query_embedding, n_results, {})
+            groups = {}
+            for chunk_id, doc, metadata, distance in zip(
+                results['ids'], results['documents'], results['metadatas'], results['distances']
+            ):
+                hits = groups.setdefault(metadata['document_id'], [])
+                if len(hits) < top_k_per_document:
+                    hits.append({
+                        'chunk_id': chunk_id,
+                        'text': doc,
+                        'metadata': metadata,
+                        'distance': distance
+                    })
+            if len(groups) >= max_documents or n_results >= total:
+                break
+            n_results = min(n_results * 4, total)
+        
+        # Hits arrive sorted by distance, so the first hit of each group is its best
+        ranked = sorted(groups.items(), key=lambda item: item[1][0]['distance'])
+        return [
+            {'document_id': document_id, 'chunks': hits}
+            for document_id, hits in ranked[:max_documents]
+        ]
+    
+    def _query(self, collection, query_embedding: List[float], n_results: int, where_filter: Dict[str, Any], include_embeddings: bool = False) -> Dict[str, Any]:
+        include = ['documents', 'metadatas', 'distances']
+        if include_embeddings:
+            include.append('embeddings')
+        
+        results = collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
-            where=where_filter if where_filter else None
+            where=where_filter if where_filter else None,
+            include=include
         )
         
-        return {
+        output = {
+            'ids': results['ids'][0] if results['ids'] else [],
             'documents': results['documents'][0] if results['documents'] else [],
             'metadatas': results['metadatas'][0] if results['metadatas'] else [],
             'distances': results['distances'][0] if results['distances'] else []
         }
+        if include_embeddings:
+            embeddings = results.get('embeddings')
+            output['embeddings'] = embeddings[0] if embeddings is not None and len(embeddings) else []
+        return output
     
-    def delete_document_chunks(self, document_id: int):
-        """Delete all chunks for a specific document"""
-        # Get all chunk IDs for this document
-        results = self.collection.get(
-            where={'document_id': document_id}
-        )
+    def delete_document_chunks(self, document_id: int, user_id: int = None):
+        """Delete all chunks for a specific document with a filtered delete"""
+        collections = [self.collection]
+        if user_id:
+            collections.insert(0, self.find_user_collection(user_id))
         
-        if results['ids']:
-            self.collection.delete(ids=results['ids'])
-
+        for collection in filter(None, collections):
+            collection.delete(where={'document_id': document_id})
+    
+    def iter_chunk_collections(self):
+        """Yield the shared collection and every per-user partition"""
+        yield self.collection
+        for collection in self.client.list_collections():
+            # chromadb >= 0.6 returns names, older versions return collection objects
+            name = collection if isinstance(collection, str) else collection.name
+            if re.fullmatch(r'user_\d+_chunks', name):
+                yield self.client.get_collection(name)
@@ -2,28 +2,57 @@ import json
 import re
 from typing import List, Dict, Any, Optional
 from src.utils.document_processor import EmbeddingService, VectorStore
+from src.utils.reranking import maximal_marginal_relevance
+from src.utils.services import get_embedding_service, get_vector_store
+from src.utils.sessions import SessionStore
 
 class QuestionAnsweringService:
     """Handles question answering using retrieved document chunks"""
     
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
+    def __init__(self, embedding_service: EmbeddingService = None, vector_store: VectorStore = None):
+        self.embedding_service = embedding_service or get_embedding_service()
+        self.vector_store = vector_store or get_vector_store()
+        self.sessions = SessionStore()
     
-    def answer_question(self, question: str, document_id: int = None, max_context_length: int = 2000) -> Dict[str, Any]:
+    def answer_question(self, question: str, document_id: int = None, max_context_length: int = 2000, user_id: int = None,
+                        n_candidates: int = 30, mmr_lambda: float = 0.7, duplicate_threshold: float = 0.95,
+                        session_id: str = None, session_min_similarity: float = 0.5, session_min_hits: int = 2) -> Dict[str, Any]:
         """
-        Answer a question based on document content using retrieval-augmented approach
+        Answer a question based on document content using retrieval-augmented approach.
+        Over-fetches n_candidates chunks, re-ranks them with Maximal Marginal
+        Relevance to push near-duplicates down (or out), then packs the
+        context up to max_context_length characters.
+        
+        With a session_id, follow-up questions are first scored against the
+        chunks retrieved earlier in the same session; the vector store is only
+        queried when fewer than session_min_hits of them reach
+        session_min_similarity.
         """
         try:
             # Generate embedding for the question
             question_embedding = self.embedding_service.generate_single_embedding(question)
             
-            # Search for relevant chunks
-            search_results = self.vector_store.search_similar(
-                query_embedding=question_embedding,
-                document_id=document_id,
-                n_results=10
-            )
+            working_set = self.sessions.get(session_id, user_id, document_id) if session_id else None
+            search_results = None
+            retrieval = 'index'
+            if working_set is not None and working_set.chunks:
+                session_results = working_set.search(question_embedding, n_candidates)
+                hits = sum(1 for distance in session_results['distances'] if 1 - distance >= session_min_similarity)
+                if hits >= session_min_hits:
+                    search_results = session_results
+                    retrieval = 'session'
+            
+            if search_results is None:
+                # Search for relevant chunks
+                search_results = self.vector_store.search_similar(
+                    query_embedding=question_embedding,
+                    document_id=document_id,
+                    n_results=n_candidates,
+                    user_id=user_id,
+                    include_embeddings=True
+                )
+                if working_set is not None:
+                    working_set.add(search_results)
             
             if not search_results['documents']:
                 return {
@@ -33,24 +62,31 @@ class QuestionAnsweringService:
                     'sources': []
                 }
             
-            # Prepare context from retrieved chunks
+            # Only re-rank chunks with reasonable similarity (distance < 0.7)
+            candidates = [i for i, distance in enumerate(search_results['distances']) if distance < 0.7]
+            order = maximal_marginal_relevance(
+                question_embedding,
+                [search_results['embeddings'][i] for i in candidates],
+                lambda_mult=mmr_lambda,
+                duplicate_threshold=duplicate_threshold
+            )
+            
+            # Pack context in MMR order, skipping chunks that would overflow the budget
             context_chunks = []
             total_length = 0
             
-            for i, (doc, metadata, distance) in enumerate(zip(
-                search_results['documents'],
-                search_results['metadatas'],
-                search_results['distances']
-            )):
-                # Only include chunks with reasonable similarity (distance < 0.7)
-                if distance < 0.7 and total_length + len(doc) <= max_context_length:
-                    context_chunks.append({
-                        'text': doc,
-                        'metadata': metadata,
-                        'similarity': 1 - distance,  # Convert distance to similarity
-                        'chunk_id': i
-                    })
-                    total_length += len(doc)
+            for position in order:
+                i = candidates[position]
+                doc = search_results['documents'][i]
+                if total_length + len(doc) > max_context_length:
+                    continue
+                context_chunks.append({
+                    'text': doc,
+                    'metadata': search_results['metadatas'][i],
+                    'similarity': 1 - search_results['distances'][i],  # Convert distance to similarity
+                    'chunk_id': search_results['ids'][i]
+                })
+                total_length += len(doc)
             
             if not context_chunks:
                 return {
@@ -84,7 +120,8 @@ class QuestionAnsweringService:
                 'answer': answer,
                 'confidence_score': round(confidence_score, 3),
                 'sources': sources,
-                'context_used': len(context_chunks)
+                'context_used': len(context_chunks),
+                'retrieval': retrieval
             }
             
         except Exception as e:
@@ -95,6 +132,36 @@ class QuestionAnsweringService:
                 'sources': []
             }
     
+    def search_library(self, question: str, user_id: int, top_k_per_document: int = 3, max_documents: int = 10) -> List[Dict[str, Any]]:
+        """
+        Search across every document a user owns, grouped by document
+        """
+        question_embedding = self.embedding_service.generate_single_embedding(question)
+        groups = self.vector_store.search_user_library(
+            query_embedding=question_embedding,
+            user_id=user_id,
+            top_k_per_document=top_k_per_document,
+            max_documents=max_documents
+        )
+        
+        return [
+            {
+                'document_id': group['document_id'],
+                'best_similarity': round(1 - group['chunks'][0]['distance'], 3),
+                'chunks': [
+                    {
+                        'chunk_id': chunk['chunk_id'],
+                        'text_preview': chunk['text'][:200] + "..." if len(chunk['text']) > 200 else chunk['text'],
+                        'page_number': chunk['metadata'].get('page_number'),
+                        'section_type': chunk['metadata'].get('section_type'),
+                        'similarity': round(1 - chunk['distance'], 3)
+                    }
+                    for chunk in group['chunks']
+                ]
+            }
+            for group in groups
+        ]
+    
     def _generate_answer(self, question: str, context_chunks: List[Dict[str, Any]]) -> str:
         """
         Generate an answer using a simple template-based approach
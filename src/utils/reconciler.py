@@ -0,0 +1,164 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from src.models.user import db
+from src.models.document import Conversation, Document, DocumentChunk
+from src.utils.document_processor import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class Reconciler:
+    """
+    Finds and purges state left behind by crashed uploads or partial deletes:
+    documents stuck in 'processing', vectors and chunk rows whose document no
+    longer exists, and upload files no document points at.
+
+    Writers create a file before its document row, and a document stays
+    'processing' until its vectors are written, so only state older than
+    ``grace_seconds`` is purged. Must be called inside an app context.
+    """
+
+    def __init__(self, vector_store: VectorStore, upload_folder: str, grace_seconds: float = 3600, page_size: int = 5000):
+        self.vector_store = vector_store
+        self.upload_folder = upload_folder
+        self.grace_seconds = grace_seconds
+        self.page_size = page_size
+
+    def run_once(self) -> Dict[str, Any]:
+        report = {
+            'stalled_documents_deleted': 0,
+            'vectors_deleted': 0, 'vector_bytes': 0,
+            'chunk_rows_deleted': 0, 'chunk_bytes': 0,
+            'files_deleted': 0, 'file_bytes': 0,
+        }
+        self._purge_stalled_documents(report)
+        live_documents = {doc_id for (doc_id,) in db.session.query(Document.id)}
+        self._purge_vectors(live_documents, report)
+        self._purge_chunk_rows(report)
+        self._purge_files(report)
+        report['bytes_reclaimed'] = report['vector_bytes'] + report['chunk_bytes'] + report['file_bytes']
+        logger.info("Reconciler reclaimed %d bytes: %s", report['bytes_reclaimed'], report)
+        return report
+
+    def _purge_stalled_documents(self, report: Dict[str, Any]):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.grace_seconds)
+        stalled = db.session.query(Document.id, Document.user_id).filter(
+            Document.processing_status == 'processing', Document.upload_timestamp < cutoff
+        ).all()
+        if not stalled:
+            return
+        # Vectors may be partly written; their files become unreferenced and
+        # are removed by _purge_files in the same pass
+        for doc_id, user_id in stalled:
+            self.vector_store.delete_document_chunks(doc_id, user_id=user_id)
+        ids = [doc_id for doc_id, _ in stalled]
+        DocumentChunk.query.filter(DocumentChunk.document_id.in_(ids)).delete(synchronize_session=False)
+        Conversation.query.filter(Conversation.document_id.in_(ids)).delete(synchronize_session=False)
+        Document.query.filter(Document.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        report['stalled_documents_deleted'] = len(ids)
+
+    def _purge_vectors(self, live_documents: set, report: Dict[str, Any]):
+        cutoff = time.time() - self.grace_seconds
+        for collection in self.vector_store.iter_chunk_collections():
+            # Page through metadata only; chunk text and embeddings stay on disk
+            orphan_ids = []
+            offset = 0
+            while True:
+                page = collection.get(include=['metadatas'], limit=self.page_size, offset=offset)
+                if not page['ids']:
+                    break
+                for chunk_id, metadata in zip(page['ids'], page['metadatas']):
+                    if metadata.get('document_id') not in live_documents and metadata.get('created_at', 0) < cutoff:
+                        orphan_ids.append(chunk_id)
+                        report['vector_bytes'] += metadata.get('length') or 0
+                offset += len(page['ids'])
+            if not orphan_ids:
+                continue
+
+            dimension = len(collection.get(ids=orphan_ids[:1], include=['embeddings'])['embeddings'][0])
+            for start in range(0, len(orphan_ids), self.page_size):
+                collection.delete(ids=orphan_ids[start:start + self.page_size])
+            report['vectors_deleted'] += len(orphan_ids)
+            report['vector_bytes'] += len(orphan_ids) * dimension * 4
+
+    def _purge_chunk_rows(self, report: Dict[str, Any]):
+        orphaned = DocumentChunk.query.filter(~DocumentChunk.document_id.in_(db.session.query(Document.id)))
+        count, size = orphaned.with_entities(db.func.count(DocumentChunk.id), db.func.sum(db.func.length(DocumentChunk.chunk_text))).one()
+        if count:
+            orphaned.delete(synchronize_session=False)
+            db.session.commit()
+        report['chunk_rows_deleted'] = count
+        report['chunk_bytes'] = size or 0
+
+    def _purge_files(self, report: Dict[str, Any]):
+        if not os.path.isdir(self.upload_folder):
+            return
+        referenced = {
+            os.path.basename(path) for (path,) in db.session.query(Document.file_path) if path
+        }
+        cutoff = time.time() - self.grace_seconds
+        for entry in os.scandir(self.upload_folder):
+            if not entry.is_file() or entry.name in referenced:
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            report['files_deleted'] += 1
+            report['file_bytes'] += stat.st_size
+
+
+def start_background_reconciler(app, vector_store: VectorStore, upload_folder: str, interval: float, lock_path: str):
+    """
+    Run the reconciler every `interval` seconds in a daemon thread.
+
+    Every server process may call this; an flock on `lock_path` plus the time
+    of the last pass, stored in the lock file, make sure only one of them
+    runs a pass per interval.
+    """
+    reconciler = Reconciler(vector_store, upload_folder)
+
+    def run_if_due():
+        os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+        with open(lock_path, 'a+') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                lock_file.seek(0)
+                try:
+                    last_pass = float(lock_file.read() or 0)
+                except ValueError:
+                    last_pass = 0
+                if time.time() - last_pass < interval * 0.9:
+                    return
+                with app.app_context():
+                    reconciler.run_once()
+                lock_file.truncate(0)
+                lock_file.write(f"{time.time()}\n")
+                lock_file.flush()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                run_if_due()
+            except Exception:
+                logger.exception("Reconciler pass failed")
+
+    thread = threading.Thread(target=loop, name='reconciler', daemon=True)
+    thread.start()
+    return thread
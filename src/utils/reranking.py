@@ -0,0 +1,52 @@
+import numpy as np
+from typing import List, Sequence
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def maximal_marginal_relevance(
+    query_embedding: Sequence[float],
+    candidate_embeddings: Sequence[Sequence[float]],
+    k: int = None,
+    lambda_mult: float = 0.7,
+    duplicate_threshold: float = None
+) -> List[int]:
+    """
+    Order candidates by Maximal Marginal Relevance and return their indices.
+
+    Each step picks the candidate maximising
+    ``lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))``.
+    All similarities come from one candidate-by-candidate matrix product, and
+    the running max is updated with a single row per step. Candidates whose
+    cosine to an already selected chunk reaches ``duplicate_threshold`` are
+    dropped as near-duplicates.
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.size == 0:
+        return []
+    
+    candidates = _normalise(candidates)
+    query = _normalise(np.asarray(query_embedding, dtype=np.float32))
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    
+    n = len(candidates)
+    k = n if k is None else min(k, n)
+    available = np.ones(n, dtype=bool)
+    redundancy = np.zeros(n, dtype=np.float32)
+    selected = []
+    
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        if duplicate_threshold is not None:
+            available &= similarity[best] < duplicate_threshold
+    
+    return selected
@@ -0,0 +1,72 @@
+import threading
+from src.utils.document_processor import EmbeddingService, VectorStore
+
+# Process-wide service instances. Route modules and the QA service share these
+# so the embedding model is loaded once per process instead of once per module,
+# and a pre-forking server can build them in the master before workers fork.
+
+_lock = threading.Lock()
+_embedding_service = None
+_vector_store = None
+_ready = threading.Event()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Return the shared embedding service, creating it on first use"""
+    global _embedding_service
+    if _embedding_service is None:
+        with _lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+def get_vector_store() -> VectorStore:
+    """Return the shared vector store, opening it on first use"""
+    global _vector_store
+    if _vector_store is None:
+        with _lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+    return _vector_store
+
+
+def warm_up(before_fork: bool = False):
+    """
+    Load the model, open the stores and run a dummy encode and query so the
+    first real request does not pay for lazy initialisation.
+
+    With `before_fork`, backends that cannot be forked (ONNX Runtime) are
+    left unbuilt; each worker warms them up again after the fork.
+    """
+    embedding_service = get_embedding_service()
+    vector_store = get_vector_store()
+    if embedding_service.fork_safe or not before_fork:
+        embedding = embedding_service.generate_single_embedding("warm-up")
+        if vector_store.collection.count() > 0:
+            vector_store.search_similar(query_embedding=embedding, n_results=1)
+    _ready.set()
+
+
+def is_ready() -> bool:
+    """True once warm_up has completed in this process"""
+    return _ready.is_set()
+
+
+def reopen_after_fork():
+    """
+    Re-open file-backed handles in a freshly forked worker.
+
+    The model weights stay shared copy-on-write with the master, but SQLite
+    connections must not be used across a fork, so the Chroma client is
+    rebuilt in the child.
+    """
+    global _vector_store
+    if _vector_store is None:
+        return
+    from chromadb.api.client import SharedSystemClient
+    SharedSystemClient.clear_system_cache()
+    vector_store = VectorStore(_vector_store.persist_directory)
+    _vector_store.client = vector_store.client
+    _vector_store.collection = vector_store.collection
+    _vector_store.user_collections = {}
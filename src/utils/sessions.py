@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+class SessionWorkingSet:
+    """Recently retrieved chunks of one conversation, with their embeddings"""
+
+    def __init__(self, user_id: int, document_id: int, capacity: int):
+        self.user_id = user_id
+        self.document_id = document_id
+        self.capacity = capacity
+        self.chunks = OrderedDict()  # chunk id -> (text, metadata, embedding), oldest first
+        self._matrix = None
+        self._lock = threading.Lock()
+        self.touched = time.monotonic()
+
+    def add(self, results: Dict[str, Any]):
+        """Merge search_similar results (with embeddings) into the working set"""
+        with self._lock:
+            for chunk_id, doc, metadata, embedding in zip(
+                results['ids'], results['documents'], results['metadatas'], results['embeddings']
+            ):
+                self.chunks.pop(chunk_id, None)
+                self.chunks[chunk_id] = (doc, metadata, np.asarray(embedding, dtype=np.float32))
+            while len(self.chunks) > self.capacity:
+                self.chunks.popitem(last=False)
+            self._matrix = None
+
+    def search(self, query_embedding: List[float], n_results: int) -> Dict[str, Any]:
+        """Cosine search over the working set, in search_similar's result shape"""
+        with self._lock:
+            ids = list(self.chunks)
+            if self._matrix is None:
+                matrix = np.stack([self.chunks[i][2] for i in ids])
+                self._matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+            distances = 1 - self._matrix @ query
+            order = np.argsort(distances)[:n_results]
+            return {
+                'ids': [ids[i] for i in order],
+                'documents': [self.chunks[ids[i]][0] for i in order],
+                'metadatas': [self.chunks[ids[i]][1] for i in order],
+                'distances': [float(distances[i]) for i in order],
+                'embeddings': [self.chunks[ids[i]][2] for i in order]
+            }
+
+
+class SessionStore:
+    """
+    Per-process LRU of conversation working sets, expired after `ttl_seconds`
+    of inactivity. Sessions are keyed by a client-chosen session id and bound
+    to one user and document.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800, capacity: int = 64):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.capacity = capacity
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, user_id: int, document_id: int) -> SessionWorkingSet:
+        """Return the session's working set, starting a fresh one if needed"""
+        now = time.monotonic()
+        with self._lock:
+            working_set = self._sessions.pop(session_id, None)
+            if (working_set is None or now - working_set.touched > self.ttl_seconds
+                    or (working_set.user_id, working_set.document_id) != (user_id, document_id)):
+                working_set = SessionWorkingSet(user_id, document_id, self.capacity)
+            working_set.touched = now
+            self._sessions[session_id] = working_set
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return working_set
@@ -0,0 +1,6 @@
+# Production entry point. Loaded once in the gunicorn master (preload_app) so
+# the embedding model is built and warmed before workers are forked.
+from main import app
+from src.utils.services import warm_up
+
+warm_up(before_fork=True)